@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+from django.core.cache import cache
+from django.db.models import Sum
+
+from .cache import TIMEOUT, make_key
+from .models import Account, Box
+
+
+def get_totals(owner_id):
+    """Return the cached amounts of the user's money, as a dict:
+    - `total`: the total amount of the accounts (None if no account)
+    - `real`: the total amount of the real accounts
+    - `virtual`: the total amount of the virtual accounts
+    - `boxes`: a dict mapping the pk of every box to its amount
+    """
+    key = make_key(owner_id, 'totals')
+    totals = cache.get(key)
+    if totals is not None:
+        return totals
+
+    by_kind = dict(Account.objects.filter(owner_id=owner_id).values_list(
+        'is_virtual').annotate(total=Sum('amount')).order_by())
+    totals = {
+        'total': sum(by_kind.values()) if by_kind else None,
+        'real': by_kind.get(False, 0),
+        'virtual': by_kind.get(True, 0),
+        'boxes': dict(Box.objects.filter(owner_id=owner_id).values_list(
+            'pk', 'amount')),
+    }
+    cache.set(key, totals, TIMEOUT)
+    return totals
@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+"""Spending reports computed with NumPy.
+Transactions are loaded as columns, amounts being integer cents so that
+sums are exact, and every report is computed on whole arrays at once.
+"""
+from decimal import Decimal
+
+import numpy as np
+
+from .aggregates import get_totals
+from .models import SeriesBucket, Transaction
+
+
+class Columns(object):
+    """The transactions of a user as NumPy arrays ordered by date:
+    `dates` (`datetime64[D]`), `cents` (`int64`), `accounts` and `boxes`
+    (the ids, as `int64`).
+    """
+
+    def __init__(self, owner_id, since=None, until=None):
+        queryset = Transaction.objects.filter(owner_id=owner_id)
+        if since is not None:
+            queryset = queryset.filter(date__gte=since)
+        if until is not None:
+            queryset = queryset.filter(date__lte=until)
+        rows = list(queryset.extra(
+            select={'cents': '("{}"."amount" * 100)::bigint'.format(
+                Transaction._meta.db_table)}).order_by('date').values_list(
+                    'date', 'cents', 'account_id', 'box_id'))
+        dates, cents, accounts, boxes = zip(*rows) if rows else ([],) * 4
+        self.dates = np.array(dates, dtype='datetime64[D]')
+        self.cents = np.array(cents, dtype=np.int64)
+        self.accounts = np.array(accounts, dtype=np.int64)
+        self.boxes = np.array(boxes, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.cents)
+
+
+def to_decimal(cents):
+    """Return an amount in cents as a `Decimal` with two decimal places."""
+    return Decimal(int(cents)).scaleb(-2)
+
+
+def week_starts(dates):
+    """Return the monday starting the week of every date."""
+    # The epoch (1970-01-01) is a thursday, hence the offset of 3 days.
+    return dates - (dates.astype(np.int64) + 3) % 7
+
+
+def month_starts(dates):
+    """Return the first day of the month of every date."""
+    return dates.astype('datetime64[M]').astype('datetime64[D]')
+
+
+def grouped_sums(keys, cents):
+    """Return a couple (unique keys, sums) of the cents by key, keys being
+    sorted.
+    """
+    unique, inverse = np.unique(keys, return_inverse=True)
+    sums = np.zeros(len(unique), dtype=np.int64)
+    np.add.at(sums, inverse, cents)
+    return unique, sums
+
+
+def balances(deltas, final):
+    """Return the balance at the end of every period, from the `deltas` of
+    the periods and the `final` balance after the last one.
+    """
+    return final - (deltas.sum() - np.cumsum(deltas))
+
+
+def rolling_mean(values, window):
+    """Return the mean of every `window` consecutive values, aligned on the
+    last value of the window, as floats.
+    """
+    if len(values) < window:
+        return np.array([], dtype=np.float64)
+    sums = np.cumsum(np.concatenate([[0], values]))
+    return (sums[window:] - sums[:-window]) / window
+
+
+def weekly_balances(owner_id, columns=None):
+    """Return a list of couples (week, balance) ordered by week, like
+    `TransactionManager.weekly_balances()`.
+    """
+    if columns is None:
+        columns = Columns(owner_id)
+    weeks, deltas = grouped_sums(week_starts(columns.dates), columns.cents)
+    total = get_totals(owner_id)['total'] or 0
+    return list(zip(weeks.tolist(), map(
+        to_decimal, balances(deltas, int(total * 100)))))
+
+
+def monthly_sums(owner_id, columns=None):
+    """Return a list of couples (month, sum) ordered by month, like
+    `TransactionManager.monthly_sums()`.
+    """
+    if columns is None:
+        columns = Columns(owner_id)
+    months, sums = grouped_sums(month_starts(columns.dates), columns.cents)
+    return list(zip(months.tolist(), map(to_decimal, sums)))
+
+
+def box_breakdown(owner_id, columns=None):
+    """Return a dict mapping the id of every box to a couple (income,
+    spending) of its transactions, spending being positive.
+    """
+    if columns is None:
+        columns = Columns(owner_id)
+    credits = columns.cents > 0
+    boxes, income = grouped_sums(columns.boxes[credits],
+                                 columns.cents[credits])
+    breakdown = {box: (to_decimal(cents), Decimal('0.00'))
+                 for box, cents in zip(boxes.tolist(), income)}
+    boxes, spending = grouped_sums(columns.boxes[~credits],
+                                   -columns.cents[~credits])
+    for box, cents in zip(boxes.tolist(), spending):
+        breakdown[box] = (breakdown.get(box, (Decimal('0.00'),))[0],
+                          to_decimal(cents))
+    return breakdown
+
+
+def rolling_monthly_average(owner_id, window=3, columns=None):
+    """Return a list of couples (month, average) where `average` is the mean
+    of the sums of the `window` months ending with `month`. Months without
+    transactions count as zero.
+    """
+    if columns is None:
+        columns = Columns(owner_id)
+    if not len(columns):
+        return []
+    months, sums = grouped_sums(month_starts(columns.dates), columns.cents)
+    # Fill the gaps so that the window spans calendar months.
+    indexes = (months.astype('datetime64[M]') -
+               months[0].astype('datetime64[M]')).astype(np.int64)
+    filled = np.zeros(indexes[-1] + 1, dtype=np.int64)
+    filled[indexes] = sums
+    all_months = (months[0].astype('datetime64[M]') +
+                  np.arange(len(filled))).astype('datetime64[D]')
+    averages = rolling_mean(filled, window)
+    return [
+        (month, to_decimal(round(average)))
+        for month, average in zip(all_months[window - 1:].tolist(),
+                                  averages.tolist())
+    ]
+
+
+def year_over_year(owner_id, columns=None):
+    """Return a list of triples (month, sum, previous) ordered by month,
+    where `previous` is the sum of the same month of the previous year, or
+    None if there was no transaction then.
+    """
+    if columns is None:
+        columns = Columns(owner_id)
+    if not len(columns):
+        return []
+    months, sums = grouped_sums(
+        columns.dates.astype('datetime64[M]'), columns.cents)
+    previous = np.searchsorted(months, months - 12)
+    found = (previous < len(months)) & (
+        months[np.minimum(previous, len(months) - 1)] == months - 12)
+    return [
+        (month, to_decimal(total),
+         to_decimal(sums[index]) if has_previous else None)
+        for month, total, index, has_previous in zip(
+            months.astype('datetime64[D]').tolist(), sums, previous, found)
+    ]
+
+
+def bucket_series(owner_id, period, since=None):
+    """Return a list of couples (start, value) ordered by start, built from
+    the bucket store rather than from the transactions: the balance at the
+    end of every week for `SeriesBucket.WEEK`, the sum of every month for
+    `SeriesBucket.MONTH`.
+    """
+    deltas = SeriesBucket.objects.deltas(owner_id, period, since)
+    if not deltas:
+        return []
+    starts, amounts = zip(*deltas)
+    cents = np.array([int(amount * 100) for amount in amounts],
+                     dtype=np.int64)
+    if period == SeriesBucket.WEEK:
+        # Later weeks are all in the store, so the balances computed
+        # backwards from the current total are right even with `since`.
+        total = get_totals(owner_id)['total'] or 0
+        cents = balances(cents, int(total * 100))
+    return list(zip(starts, map(to_decimal, cents)))
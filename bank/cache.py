@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+"""Per-user cache of data derived from the bank models.
+Every cached value of a user is namespaced by a version number, so that
+bumping the version invalidates all of them at once.
+"""
+from contextlib import contextmanager
+import threading
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+
+TIMEOUT = 60 * 60 * 24
+
+
+def _version_key(owner_id):
+    return 'bank:{}:version'.format(owner_id)
+
+
+def get_version(owner_id):
+    """Return the current cache version of the user."""
+    key = _version_key(owner_id)
+    version = cache.get(key)
+    if version is None:
+        # Start from the current time rather than 1 so that values cached
+        # before the version key was evicted can't be served again.
+        cache.add(key, int(time.time() * 1000), None)
+        version = cache.get(key)
+    return version
+
+
+def make_key(owner_id, name):
+    """Return the cache key of the value `name` for the user."""
+    return 'bank:{}:{}:{}'.format(owner_id, get_version(owner_id), name)
+
+
+_local = threading.local()
+
+
+def _bump(owner_ids):
+    for owner_id in owner_ids:
+        try:
+            cache.incr(_version_key(owner_id))
+        except ValueError:
+            # No version yet, hence nothing cached for this user.
+            pass
+
+
+@contextmanager
+def atomic():
+    """Like `django.db.transaction.atomic()`, but the invalidations made
+    within the block are done again once the outermost one has exited, that
+    is after the commit. See `invalidate()`.
+    """
+    depth = getattr(_local, 'depth', 0)
+    if not depth:
+        _local.pending = set()
+    _local.depth = depth + 1
+    try:
+        with transaction.atomic():
+            yield
+    finally:
+        _local.depth = depth
+        if not depth:
+            _bump(_local.pending)
+            _local.pending = set()
+
+
+def invalidate(*owner_ids):
+    """Invalidate every cached value of the given users.
+    Within `atomic()`, the versions are bumped right away and once more
+    after the commit: a reader missing the cache in between caches the data
+    from before the commit, which must not be served afterwards.
+    """
+    owner_ids = set(owner_ids)
+    _bump(owner_ids)
+    if getattr(_local, 'depth', 0):
+        _local.pending |= owner_ids
@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+from django.core.cache import cache
+
+from .cache import TIMEOUT, make_key
+from .models import Account, Box
+
+
+def get_choices(owner_id):
+    """Return the cached accounts and boxes of the user to choose from in
+    forms, as a dict:
+    - `accounts`: the list of accounts, ordered by name
+    - `boxes`: the list of boxes, ordered by name
+    - `flow_box`: the Flow Box, or None if the user has none
+    """
+    key = make_key(owner_id, 'choices')
+    choices = cache.get(key)
+    if choices is not None:
+        return choices
+
+    boxes = list(Box.objects.filter(owner_id=owner_id).order_by('name'))
+    choices = {
+        'accounts': list(
+            Account.objects.filter(owner_id=owner_id).order_by('name')),
+        'boxes': boxes,
+        'flow_box': next((b for b in boxes if b.name == "Flow Box"), None),
+    }
+    cache.set(key, choices, TIMEOUT)
+    return choices
@@ -0,0 +1,14 @@
+# -*- coding: utf-8 -*-
+from .cache import TIMEOUT, get_version
+
+
+def bank_cache(request):
+    """Expose the cache version of the current user as `bank_cache.version`
+    so that template fragments depending on the bank models can vary on it,
+    along with the cache timeout as `bank_cache.timeout`.
+    """
+    user = getattr(request, 'user', None)
+    if user is None or not user.is_authenticated():
+        return {'bank_cache': {'version': None, 'timeout': TIMEOUT}}
+    return {'bank_cache': {'version': get_version(user.pk),
+                           'timeout': TIMEOUT}}
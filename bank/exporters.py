@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+"""Export transactions.
+Exports are generators of strings meant to feed a `StreamingHttpResponse`:
+transactions are fetched by keyset pages, so that memory usage does not
+depend on the number of transactions and the first bytes are sent as soon
+as the first page is fetched.
+"""
+import csv
+import json
+
+from ui.pagination import CursorPaginator
+
+
+COLUMNS = ['date', 'account', 'box', 'amount', 'other', 'short_description']
+
+
+def iter_pages(queryset, chunk_size=1000):
+    """Yield the transactions of the queryset by lists of `chunk_size`."""
+    paginator = CursorPaginator(queryset, chunk_size, ('-date', '-id'),
+                                with_count=False)
+    page = paginator.page()
+    while True:
+        yield page.object_list
+        if not page.has_next():
+            break
+        page = paginator.page(page.next_cursor)
+
+
+def _values(transaction):
+    return [transaction.date.isoformat(), str(transaction.account),
+            str(transaction.box), str(transaction.amount), transaction.other,
+            transaction.short_description]
+
+
+class _Echo(object):
+    """File-like object returning what is written, for `csv.writer`."""
+
+    def write(self, value):
+        return value
+
+
+def export_csv(pages):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(COLUMNS)
+    for page in pages:
+        yield ''.join(writer.writerow(_values(t)) for t in page)
+
+
+def export_json(pages):
+    yield '['
+    separator = ''
+    for page in pages:
+        if page:
+            yield separator + ','.join(
+                json.dumps(dict(zip(COLUMNS, _values(t)))) for t in page)
+            separator = ','
+    yield ']'
+
+
+EXPORTERS = {
+    'csv': ('text/csv', export_csv),
+    'json': ('application/json', export_json),
+}
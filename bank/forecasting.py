@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+"""Project the date at which the boxes of a user reach their value.
+The rate of a box is the slope of the least squares line through its daily
+balances over a recent window, fitted for all the boxes of the user at once.
+Like the fill rate of the box list, a box is measured along with its
+subboxes.
+"""
+from collections import namedtuple
+from datetime import date, timedelta
+
+import numpy as np
+from django.core.cache import cache
+from django.db.models import Q
+from django.utils import timezone
+
+from .analytics import Columns, to_decimal
+from .cache import TIMEOUT, make_key
+from .models import Box, BoxTransfer
+
+
+WINDOW = 90
+
+Forecast = namedtuple('Forecast', ['rate', 'fill_date'])
+
+
+def subtree_matrix(pks, parent_ids):
+    """Return the matrix whose row `i` has a 1 for box `i` and for all its
+    subboxes, so that multiplying it by per-box values gives the values of
+    the subtrees.
+    - `pks`: the sorted pks of the boxes
+    - `parent_ids`: the pk of the parent of every box, or None
+    """
+    index = {pk: i for i, pk in enumerate(pks)}
+    matrix = np.identity(len(pks), dtype=np.int64)
+    for i, parent_id in enumerate(parent_ids):
+        while parent_id in index:
+            matrix[index[parent_id], i] = 1
+            parent_id = parent_ids[index[parent_id]]
+    return matrix
+
+
+def add_flows(deltas, pks, box_ids, days, cents):
+    """Add `cents` to the cells (box, day) of `deltas`, ignoring the boxes
+    which are not in the sorted array `pks`.
+    """
+    known = np.in1d(box_ids, pks)
+    np.add.at(deltas, (np.searchsorted(pks, box_ids[known]), days[known]),
+              cents[known])
+
+
+def fit_rates(deltas):
+    """Return the slope of the least squares line through the cumulated
+    deltas of every row, in cents per column.
+    """
+    x = np.arange(deltas.shape[1], dtype=np.float64)
+    x -= x.mean()
+    # The sum of the centered x being zero, y needs no centering.
+    return np.cumsum(deltas, axis=1).dot(x) / x.dot(x)
+
+
+def days_to_fill(amounts, values, rates):
+    """Return the number of days for every box to reach its value at its
+    rate, 0 if it already has, or infinity if it never will or has no value
+    (NaN).
+    """
+    missing = values - amounts
+    days = np.full(len(amounts), np.inf)
+    valued = ~np.isnan(missing)
+    full = np.zeros(len(amounts), dtype=bool)
+    full[valued] = missing[valued] <= 0
+    filling = valued & ~full & (rates > 0)
+    days[full] = 0
+    days[filling] = np.ceil(missing[filling] / rates[filling])
+    return days
+
+
+def box_forecasts(owner_id, today=None, window=WINDOW):
+    """Return a dict mapping the pk of every box of the user to a
+    `Forecast`, cached until the next change to the data of the user:
+    - `rate`: the amount gained per day over the last `window` days,
+      negative if the box was emptied
+    - `fill_date`: the date at which the box reaches its value at this rate,
+      `today` if it already has, or None if it never will or has no value
+    """
+    if today is None:
+        today = timezone.now().date()
+    key = make_key(owner_id, 'box_forecasts:{}:{}'.format(today, window))
+    forecasts = cache.get(key)
+    if forecasts is not None:
+        return forecasts
+
+    boxes = list(Box.objects.filter(owner_id=owner_id).order_by(
+        'pk').values_list('pk', 'parent_box_id', 'amount', 'value'))
+    if not boxes:
+        return {}
+    pks, parent_ids, amounts, values = zip(*boxes)
+    pks = np.array(pks, dtype=np.int64)
+    since = today - timedelta(days=window - 1)
+
+    deltas = np.zeros((len(pks), window), dtype=np.int64)
+    columns = Columns(owner_id, since=since, until=today)
+    add_flows(deltas, pks, columns.boxes,
+              (columns.dates - np.datetime64(since)).astype(np.int64),
+              columns.cents)
+    transfers = list(BoxTransfer.objects.filter(
+        Q(from_box__owner_id=owner_id) | Q(to_box__owner_id=owner_id),
+        date__range=(since, today)).values_list(
+            'from_box_id', 'to_box_id', 'date', 'amount'))
+    if transfers:
+        from_ids, to_ids, dates, sums = zip(*transfers)
+        days = np.array([(day - since).days for day in dates],
+                        dtype=np.int64)
+        cents = np.array([int(amount * 100) for amount in sums],
+                         dtype=np.int64)
+        add_flows(deltas, pks, np.array(from_ids, dtype=np.int64), days,
+                  -cents)
+        add_flows(deltas, pks, np.array(to_ids, dtype=np.int64), days,
+                  cents)
+
+    subtrees = subtree_matrix(pks.tolist(), parent_ids)
+    rates = fit_rates(subtrees.dot(deltas))
+    days = days_to_fill(
+        subtrees.dot([int(amount * 100) for amount in amounts]),
+        np.array([np.nan if value is None else value * 100
+                  for value in values], dtype=np.float64),
+        rates)
+
+    # Dates beyond the calendar count as never.
+    horizon = (date.max - today).days
+    forecasts = {
+        pk: Forecast(to_decimal(round(rate)),
+                     today + timedelta(days=int(day))
+                     if day <= horizon else None)
+        for pk, rate, day in zip(pks.tolist(), rates.tolist(),
+                                 days.tolist())
+    }
+    cache.set(key, forecasts, TIMEOUT)
+    return forecasts
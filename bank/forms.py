@@ -1,58 +1,105 @@
 # -*- coding: utf-8 -*-
 from django import forms
 from django.utils import timezone
+from django.utils.translation import ugettext_lazy as _
+
+from .choices import get_choices
+from .models import Transaction, BoxTransfer
+
+
+class ObjectChoiceField(forms.ChoiceField):
+    """Choose one of a list of model instances, such as the ones returned by
+    `get_choices`, without querying the database.
+    """
+
+    def __init__(self, objects=(), empty_label="---------", *args,
+                 **kwargs):
+        super().__init__(*args, **kwargs)
+        self.empty_label = empty_label
+        self.objects = objects
+
+    @property
+    def objects(self):
+        return list(self._objects.values())
+
+    @objects.setter
+    def objects(self, objects):
+        self._objects = {str(obj.pk): obj for obj in objects}
+        self.choices = [('', self.empty_label)] + [
+            (obj.pk, str(obj)) for obj in objects]
+
+    def prepare_value(self, value):
+        return getattr(value, 'pk', value)
+
+    def to_python(self, value):
+        if value in self.empty_values:
+            return None
+        try:
+            return self._objects[str(value)]
+        except KeyError:
+            raise forms.ValidationError(
+                self.error_messages['invalid_choice'],
+                code='invalid_choice', params={'value': value})
+
+    def validate(self, value):
+        forms.Field.validate(self, value)
+
+    def has_changed(self, initial, data):
+        initial = self.prepare_value(initial)
+        initial = '' if initial is None else str(initial)
+        return initial != (data or '')
+
+
+def check_transaction(from_account, from_other, to_account, to_other):
+    """Check the debtor and the creditor of a transaction, or raise a
+    `ValidationError`.
+    """
+    if not from_account and not from_other:
+        raise forms.ValidationError(_("You must specify the debitor."))
+    elif from_account and from_other:
+        raise forms.ValidationError(
+            _("You must specify only one debitor."))
+
+    if not to_account and not to_other:
+        raise forms.ValidationError(_("You must specify the creditor."))
+    elif to_account and to_other:
+        raise forms.ValidationError(
+            _("You must specify only one creditor."))
+
+    if not from_account and not to_account:
+        raise forms.ValidationError(_(
+            "At least one of the debitor and the creditor must be one of "
+            "your accounts"))
+    elif from_account and to_account and from_account.pk == to_account.pk:
+        raise forms.ValidationError(_(
+            "You can't transfer money from one account to itself."))
 
-from .models import Account, Box, Transaction, BoxTransfer
 
 class TransactionCreateForm(forms.Form):
-    from_account = forms.ModelChoiceField(queryset=Account.objects.none(),
-                                          required=False)
+    from_account = ObjectChoiceField(required=False)
     from_other = forms.CharField(max_length=50, required=False)
     amount = forms.DecimalField(max_digits=13, decimal_places=2)
-    to_account = forms.ModelChoiceField(queryset=Account.objects.none(),
-                                        required=False)
+    to_account = ObjectChoiceField(required=False)
     to_other = forms.CharField(max_length=50, required=False)
-    box = forms.ModelChoiceField(queryset=Box.objects.none())
+    box = ObjectChoiceField()
     date = forms.DateField(initial=timezone.now)
     short_description = forms.CharField(max_length=100, required=False)
 
     def __init__(self, owner_id, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        account_queryset = Account.objects.filter(owner_id=owner_id)
-        self.fields['from_account'].queryset = account_queryset
-        self.fields['to_account'].queryset = account_queryset
-        self.fields['box'].queryset = Box.objects.filter(owner_id=owner_id)
+        choices = get_choices(owner_id)
+        self.fields['from_account'].objects = choices['accounts']
+        self.fields['to_account'].objects = choices['accounts']
+        self.fields['box'].objects = choices['boxes']
         if 'initial' not in kwargs or 'box' not in kwargs['initial']:
-            self.fields['box'].initial = \
-                self.fields['box'].queryset.get(name="Flow Box")
+            self.fields['box'].initial = choices['flow_box']
 
     def clean(self):
         cleaned_data = super().clean()
-        from_account = cleaned_data.get('from_account')
-        from_other = cleaned_data.get('from_other')
-        to_account = cleaned_data.get('to_account')
-        to_other = cleaned_data.get('to_other')
-
-        if not from_account and not from_other:
-            raise forms.ValidationError(_("You must specify the debitor."))
-        elif from_account and from_other:
-            raise forms.ValidationError(
-                _("You must specify only one debitor."))
-
-        if not to_account and not to_other:
-            raise forms.ValidationError(_("You must specify the creditor."))
-        elif to_account and to_other:
-            raise forms.ValidationError(
-                _("You must specify only one creditor."))
-
-        if not from_account and not to_account:
-            raise forms.ValidationError(_(
-                "At least one of the debitor and the creditor must be one of "
-                "your accounts"))
-        elif from_account and to_account and from_account.pk == to_account.pk:
-            raise forms.ValidationError(_(
-                "You can't transfer money from one account to itself."))
-
+        check_transaction(cleaned_data.get('from_account'),
+                          cleaned_data.get('from_other'),
+                          cleaned_data.get('to_account'),
+                          cleaned_data.get('to_other'))
         return cleaned_data
 
     def save(self):
@@ -65,29 +112,199 @@ class TransactionCreateForm(forms.Form):
         short_description = self.cleaned_data.get('short_description')
         amount = self.cleaned_data.get('amount')
 
-        if from_account:
-            Transaction.debits.create(account=from_account, box=box,
-                                      other=(to_account or to_other),
-                                      date=date, amount=amount,
-                                      short_description=short_description)
-        if to_account:
-            Transaction.credits.create(account=to_account, box=box,
-                                       other=(from_account or from_other),
-                                       date=date, amount=amount,
-                                       short_description=short_description)
-
-
-class BoxTransferForm(forms.ModelForm):
-
-    class Meta:
-        model = BoxTransfer
-        fields = ['from_box', 'to_box', 'amount']
-
-    def save(self, commit=True):
-        instance = super().save(commit=commit)
-        instance.from_box.debit(instance.amount)
-        instance.to_box.credit(instance.amount)
-        if commit:
-            instance.from_box.save()
-            instance.to_box.save()
-        return instance
+        Transaction.objects.post(box=box, amount=amount,
+                                 from_account=from_account,
+                                 from_other=from_other,
+                                 to_account=to_account, to_other=to_other,
+                                 date=date,
+                                 short_description=short_description)
+
+
+class TransactionImportForm(forms.Form):
+    file = forms.FileField()
+    format = forms.ChoiceField(choices=[
+        ('csv', "CSV"),
+        ('ofx', "OFX"),
+    ])
+    account = ObjectChoiceField()
+    box = ObjectChoiceField()
+
+    def __init__(self, owner_id, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        choices = get_choices(owner_id)
+        self.fields['account'].objects = choices['accounts']
+        self.fields['box'].objects = choices['boxes']
+        if 'initial' not in kwargs or 'box' not in kwargs['initial']:
+            self.fields['box'].initial = choices['flow_box']
+
+
+class ChartRangeForm(forms.Form):
+    since = forms.DateField(required=False)
+    until = forms.DateField(required=False)
+
+    def clean(self):
+        cleaned_data = super().clean()
+        since = cleaned_data.get('since')
+        until = cleaned_data.get('until')
+        if since and until and since > until:
+            raise forms.ValidationError(
+                _("The start date must be before the end date."))
+        return cleaned_data
+
+
+class TransactionFilterForm(forms.Form):
+    """Filter the user's transactions, submitted with GET."""
+    account = ObjectChoiceField(required=False)
+    box = ObjectChoiceField(required=False)
+    sign = forms.ChoiceField(required=False, choices=[
+        ('', _("All")),
+        ('credits', _("Credits")),
+        ('debits', _("Debits")),
+    ])
+    other = forms.CharField(label=_("Other account"), max_length=50,
+                            required=False)
+    month = forms.DateField(label=_("Month"), input_formats=['%Y-%m'],
+                            required=False)
+    date_from = forms.DateField(label=_("From"), required=False)
+    date_to = forms.DateField(label=_("To"), required=False)
+
+    def __init__(self, owner_id, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.owner_id = owner_id
+        choices = get_choices(owner_id)
+        self.fields['account'].objects = choices['accounts']
+        self.fields['box'].objects = choices['boxes']
+
+    def get_lookups(self):
+        data = self.cleaned_data
+        lookups = {
+            'account': data['account'],
+            'box': data['box'],
+            'other': data['other'] or None,
+            'date__gte': data['date_from'],
+            'date__lte': data['date_to'],
+        }
+        if data['month']:
+            lookups['date__year'] = data['month'].year
+            lookups['date__month'] = data['month'].month
+        return lookups
+
+    def get_queryset(self):
+        """Return the user's transactions matching the filters, or none if
+        the form is invalid.
+        """
+        if not self.is_valid():
+            return Transaction.objects.none()
+        manager = {
+            'credits': Transaction.credits,
+            'debits': Transaction.debits,
+        }.get(self.cleaned_data['sign'], Transaction.objects)
+        return manager.filter(owner_id=self.owner_id, **{
+            lookup: value for lookup, value in self.get_lookups().items()
+            if value is not None
+        })
+
+
+class TransactionSearchForm(TransactionFilterForm):
+    """Search the user's transactions, submitted with GET."""
+    q = forms.CharField(label=_("Search"), max_length=100, required=False)
+    min_amount = forms.DecimalField(label=_("Minimum amount"), max_digits=13,
+                                    decimal_places=2, required=False)
+    max_amount = forms.DecimalField(label=_("Maximum amount"), max_digits=13,
+                                    decimal_places=2, required=False)
+
+    def get_lookups(self):
+        lookups = super().get_lookups()
+        lookups['amount__gte'] = self.cleaned_data['min_amount']
+        lookups['amount__lte'] = self.cleaned_data['max_amount']
+        return lookups
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.is_valid() and self.cleaned_data['q']:
+            queryset = queryset.search(self.cleaned_data['q'])
+        return queryset
+
+
+class BoxTransferForm(forms.Form):
+    from_box = ObjectChoiceField(label=_("debtor box"))
+    to_box = ObjectChoiceField(label=_("creditor box"))
+    amount = forms.DecimalField(label=_("amount"), max_digits=13,
+                                decimal_places=2, min_value=0)
+
+    def __init__(self, owner_id, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        boxes = get_choices(owner_id)['boxes']
+        self.fields['from_box'].objects = boxes
+        self.fields['to_box'].objects = boxes
+
+    def save(self):
+        return BoxTransfer.objects.transfer(
+            self.cleaned_data['from_box'],
+            [(self.cleaned_data['to_box'], self.cleaned_data['amount'])])[0]
+
+
+class BoxMultiTransferForm(forms.Form):
+    """Transfer money from a box to many boxes, either by amounts or by
+    percentages of a total amount.
+    """
+    from_box = ObjectChoiceField()
+    mode = forms.ChoiceField(choices=[
+        ('amounts', _("Amounts")),
+        ('percentages', _("Percentages of the amount")),
+    ])
+    amount = forms.DecimalField(max_digits=13, decimal_places=2,
+                                min_value=0, required=False)
+    date = forms.DateField(initial=timezone.now)
+
+    def __init__(self, owner_id, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        choices = get_choices(owner_id)
+        self.boxes = choices['boxes']
+        self.fields['from_box'].objects = self.boxes
+        for box in self.boxes:
+            self.fields[self._box_field_name(box)] = forms.DecimalField(
+                label=box.name, max_digits=13, decimal_places=2,
+                min_value=0, required=False)
+        if 'initial' not in kwargs or 'from_box' not in kwargs['initial']:
+            self.fields['from_box'].initial = choices['flow_box']
+
+    def _box_field_name(self, box):
+        return 'to_box_{}'.format(box.pk)
+
+    def box_fields(self):
+        """Return the bound fields of the creditor boxes."""
+        return [self[self._box_field_name(box)] for box in self.boxes]
+
+    def clean(self):
+        cleaned_data = super().clean()
+        from_box = cleaned_data.get('from_box')
+        legs = [
+            (box, cleaned_data[self._box_field_name(box)])
+            for box in self.boxes
+            if cleaned_data.get(self._box_field_name(box))
+        ]
+
+        if not legs:
+            raise forms.ValidationError(
+                _("You must specify at least one creditor box."))
+        elif from_box and any(box.pk == from_box.pk for box, v in legs):
+            raise forms.ValidationError(
+                _("You can't transfer money from one box to itself."))
+
+        if cleaned_data.get('mode') == 'percentages':
+            if cleaned_data.get('amount') is None:
+                raise forms.ValidationError(
+                    _("You must specify the amount to share out."))
+            elif sum(v for b, v in legs) > 100:
+                raise forms.ValidationError(
+                    _("Percentages can't exceed 100 in total."))
+            legs = BoxTransfer.objects.split(cleaned_data['amount'], legs)
+
+        cleaned_data['legs'] = [(box, v) for box, v in legs if v]
+        return cleaned_data
+
+    def save(self):
+        return BoxTransfer.objects.transfer(
+            self.cleaned_data['from_box'], self.cleaned_data['legs'],
+            date=self.cleaned_data['date'])
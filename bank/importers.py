@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+"""Import bank statements into an account.
+Statements are parsed as streams of rows, which are validated and inserted
+by chunks so that large files never have to fit in memory.
+"""
+import csv
+from decimal import Decimal
+from itertools import islice
+import re
+
+from django import forms
+from django.utils.translation import ugettext as _
+
+from .cache import atomic, invalidate
+from .forms import TransactionCreateForm, check_transaction
+from .models import (
+    Counterparty, DailyBalance, JournalEntry, SeriesBucket, Transaction,
+)
+
+
+def parse_csv(lines):
+    """Yield rows from CSV lines.
+    The first line must be a header naming the columns `date` (YYYY-MM-DD),
+    `amount` (negative for debits), `other` and, optionally,
+    `short_description`.
+    """
+    reader = csv.DictReader(lines)
+    for row in reader:
+        yield {
+            'line': reader.line_num,
+            'date': row.get('date'),
+            'amount': row.get('amount'),
+            'other': row.get('other'),
+            'short_description': row.get('short_description') or '',
+        }
+
+
+_OFX_TAG = re.compile(r'<(/?)(\w+)>([^<\r\n]*)')
+
+
+def parse_ofx(lines):
+    """Yield rows from the `STMTTRN` elements of OFX lines.
+    Both SGML (OFX 1.x, without closing tags) and XML files are supported.
+    """
+    row = None
+    for line_num, line in enumerate(lines, 1):
+        for closing, tag, value in _OFX_TAG.findall(line):
+            tag = tag.upper()
+            value = value.strip()
+            if tag == 'STMTTRN':
+                if closing:
+                    yield row
+                    row = None
+                else:
+                    row = {'line': line_num, 'date': None, 'amount': None,
+                           'other': None, 'short_description': ''}
+            elif row is None or closing:
+                continue
+            elif tag == 'DTPOSTED':
+                row['date'] = '{}-{}-{}'.format(
+                    value[0:4], value[4:6], value[6:8])
+            elif tag == 'TRNAMT':
+                row['amount'] = value.replace(',', '.')
+            elif tag == 'NAME':
+                row['other'] = value
+            elif tag == 'MEMO':
+                row['short_description'] = value
+
+
+PARSERS = {
+    'csv': parse_csv,
+    'ofx': parse_ofx,
+}
+
+
+class TransactionImporter(object):
+    """Import rows into an account, affecting them to the given box.
+    Positive amounts are credits from the other account, negative amounts
+    are debits to the other account.
+    """
+    chunk_size = 1000
+
+    def __init__(self, account, box, chunk_size=None):
+        self.account = account
+        self.box = box
+        if chunk_size is not None:
+            self.chunk_size = chunk_size
+
+    def build(self, row):
+        """Return the transaction of a row, validated with the same rules
+        as `TransactionCreateForm`, or raise a `ValidationError`.
+        """
+        fields = TransactionCreateForm.base_fields
+        amount = fields['amount'].clean(row['amount'])
+        other = fields['to_other'].clean(row['other'])
+        if amount < 0:
+            check_transaction(self.account, None, None, other)
+        else:
+            check_transaction(None, other, self.account, None)
+        return Transaction(
+            owner_id=self.account.owner_id, account=self.account,
+            box=self.box, other=other, amount=amount,
+            date=fields['date'].clean(row['date']),
+            short_description=fields['short_description'].clean(
+                row['short_description']))
+
+    def run(self, rows):
+        """Import the rows and return the number of created transactions.
+        If any row is invalid, nothing is imported and a `ValidationError`
+        listing every invalid row is raised.
+        Balances are updated once for the whole import.
+        """
+        rows = iter(rows)
+        errors = []
+        count = 0
+        total = Decimal(0)
+        with atomic():
+            chunk = list(islice(rows, self.chunk_size))
+            while chunk:
+                transactions = []
+                for row in chunk:
+                    try:
+                        transactions.append(self.build(row))
+                    except forms.ValidationError as e:
+                        errors.extend(
+                            _("Line {line}: {message}").format(
+                                line=row['line'], message=message)
+                            for message in e.messages)
+                if not errors:
+                    JournalEntry.objects.open([[t] for t in transactions])
+                    Transaction.objects.bulk_create(transactions)
+                    Counterparty.objects.record(transactions)
+                    SeriesBucket.objects.add(transactions)
+                    total += sum(t.amount for t in transactions)
+                    count += len(transactions)
+                chunk = list(islice(rows, self.chunk_size))
+            if errors:
+                raise forms.ValidationError(errors)
+            Transaction.objects.apply_deltas({self.account.pk: total},
+                                             {self.box.pk: total})
+            DailyBalance.objects.rebuild([self.account.pk])
+        invalidate(self.account.owner_id)
+        return count
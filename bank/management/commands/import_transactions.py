@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+
+from bank.importers import PARSERS, TransactionImporter
+from bank.models import Account, Box
+
+
+class Command(BaseCommand):
+    help = "Import transactions from a CSV or OFX bank statement"
+
+    def add_arguments(self, parser):
+        parser.add_argument('filename')
+        parser.add_argument(
+            '--account', type=int, required=True,
+            help="The id of the account to import the transactions into.")
+        parser.add_argument(
+            '--box', type=int,
+            help="The id of the box to affect the transactions to. "
+                 "(default: the Flow Box of the account owner)")
+        parser.add_argument(
+            '--format', choices=sorted(PARSERS),
+            help="The format of the file. (default: guessed from the "
+                 "file extension)")
+        parser.add_argument(
+            '--chunk-size', type=int, default=TransactionImporter.chunk_size,
+            help="The number of transactions inserted at once.")
+
+    def handle(self, *args, **options):
+        filename = options['filename']
+        file_format = options['format'] or filename.rsplit('.', 1)[-1].lower()
+        if file_format not in PARSERS:
+            raise CommandError(
+                "Unknown format {}, use --format.".format(file_format))
+
+        try:
+            account = Account.objects.get(pk=options['account'])
+            if options['box'] is None:
+                box = Box.objects.get(owner_id=account.owner_id,
+                                      name="Flow Box")
+            else:
+                box = Box.objects.get(owner_id=account.owner_id,
+                                      pk=options['box'])
+        except (Account.DoesNotExist, Box.DoesNotExist) as e:
+            raise CommandError(str(e))
+
+        importer = TransactionImporter(account, box, options['chunk_size'])
+        with open(filename, encoding='utf-8', newline='') as f:
+            try:
+                count = importer.run(PARSERS[file_format](f))
+            except ValidationError as e:
+                raise CommandError('\n'.join(e.messages))
+        self.stdout.write("{} transactions imported.".format(count))
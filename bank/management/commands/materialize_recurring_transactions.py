@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from bank.models import RecurringTransaction
+
+
+class Command(BaseCommand):
+    help = "Create the transactions of all due recurring transactions"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--date',
+            help="Create occurrences until this date, as YYYY-MM-DD. "
+                 "(default: today)")
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help="The number of recurring transactions processed at once.")
+
+    def handle(self, *args, **options):
+        if options['date']:
+            try:
+                until = datetime.strptime(options['date'], '%Y-%m-%d').date()
+            except ValueError as e:
+                raise CommandError(str(e))
+        else:
+            until = timezone.localtime(timezone.now()).date()
+        count = RecurringTransaction.objects.materialize(
+            until, options['batch_size'])
+        self.stdout.write("{} transactions created.".format(count))
@@ -0,0 +1,18 @@
+# -*- coding: utf-8 -*-
+from django.core.management.base import BaseCommand
+
+from bank.models import DailyBalance
+
+
+class Command(BaseCommand):
+    help = "Rebuild the daily balance snapshots from the transactions"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'account_ids', nargs='*', type=int, metavar='account_id',
+            help="Only rebuild snapshots of these accounts.")
+
+    def handle(self, *args, **options):
+        account_ids = options['account_ids'] or None
+        DailyBalance.objects.rebuild(account_ids)
+        self.stdout.write("Daily balances rebuilt.")
@@ -0,0 +1,18 @@
+# -*- coding: utf-8 -*-
+from django.core.management.base import BaseCommand
+
+from bank.models import SeriesBucket
+
+
+class Command(BaseCommand):
+    help = "Rebuild the dashboard series buckets from the transactions"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'owner_ids', nargs='*', type=int, metavar='owner_id',
+            help="Only rebuild buckets of these users.")
+
+    def handle(self, *args, **options):
+        owner_ids = options['owner_ids'] or None
+        SeriesBucket.objects.rebuild(owner_ids)
+        self.stdout.write("Series buckets rebuilt.")
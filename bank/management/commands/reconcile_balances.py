@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+from django.core.management.base import BaseCommand
+
+from bank.models import Account, Box
+from bank.reconciliation import find_drifts, fix_drifts
+
+
+class Command(BaseCommand):
+    help = ("Compare the stored balances of the accounts and boxes with "
+            "the balances recomputed from the transactions")
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--fix', action='store_true', default=False,
+            help="Overwrite the drifting balances with the recomputed ones.")
+
+    def handle(self, *args, **options):
+        for model in (Account, Box):
+            label = model._meta.verbose_name_plural
+            drifts = find_drifts(model)
+            for drift in drifts:
+                self.stdout.write(
+                    "{label} #{pk} \"{name}\" (owner #{owner_id}): stored "
+                    "{stored}, expected {expected}".format(
+                        label=label, **drift._asdict()))
+            if drifts and options['fix']:
+                fixed = fix_drifts(model)
+                self.stdout.write("{count} {label} fixed.".format(
+                    count=len(fixed), label=label))
+            elif not drifts:
+                self.stdout.write("No drift in {}.".format(label))
@@ -1,38 +1,713 @@
 # -*- coding: utf-8 -*-
-from django.db import models
+from collections import Counter, defaultdict
+from decimal import Decimal, ROUND_DOWN
 
+from django.db import IntegrityError, connection, models
+from django.db.models import (
+    Case, DateField, DecimalField, F, IntegerField, Q, Value, When,
+)
 
-class TransactionManager(models.Manager):
-    pass
+from .cache import atomic, invalidate
 
 
-class CreditManager(models.Manager):
+def _upsert(sql, params, attempts=5):
+    """Run an upsert made of an `UPDATE` of the existing rows followed by an
+    `INSERT` of the others, retrying it when a concurrent transaction
+    inserted one of the rows first.
+    PostgreSQL 9.4 has no `ON CONFLICT`: such an `INSERT` waits for the
+    other transaction and fails on the unique constraint once it commits.
+    The statement runs in a savepoint, so that only it is rolled back, and
+    the next attempt updates the row which is now visible.
+    """
+    for attempt in range(attempts):
+        try:
+            with atomic(), connection.cursor() as cursor:
+                cursor.execute(sql, params)
+            return
+        except IntegrityError:
+            if attempt == attempts - 1:
+                raise
+
+
+class TransactionQuerySet(models.QuerySet):
+
+    def search(self, text):
+        """Return the transactions whose counterparty or description
+        contains `text`, or whose counterparty looks like it (trigram
+        similarity, to be tolerant to typos).
+        The conditions are served by the trigram indexes of both columns.
+        """
+        table = self.model._meta.db_table
+        pattern = '%{}%'.format(
+            text.replace('\\', '\\\\').replace('%', '\\%').replace(
+                '_', '\\_'))
+        return self.extra(
+            where=['("{table}"."other" ILIKE %s OR '
+                   '"{table}"."short_description" ILIKE %s OR '
+                   '"{table}"."other" %% %s)'.format(table=table)],
+            params=[pattern, pattern, text])
+
+    def facets(self):
+        """Return the number of transactions per account, per box and per
+        month, as a dict of `Counter` keyed by `account`, `box` and `month`,
+        computed with a single grouped query.
+        """
+        facets = {
+            'account': Counter(),
+            'box': Counter(),
+            'month': Counter(),
+        }
+        month = "DATE_TRUNC('month', \"{}\".\"date\")::date".format(
+            self.model._meta.db_table)
+        rows = self.order_by().extra(select={'month': month}).values(
+            'account', 'box', 'month').annotate(count=models.Count('id'))
+        for row in rows:
+            for name in facets:
+                facets[name][row[name]] += row['count']
+        return facets
+
+
+class TransactionManager(models.Manager.from_queryset(TransactionQuerySet)):
+
+    def _fetch(self, sql, params):
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return cursor.fetchall()
+
+    def weekly_balances(self, owner_id):
+        """Return a list of couples (week, balance) ordered by week, where
+        `week` is the monday starting the week and `balance` is the total
+        amount of the owner's accounts at the end of that week.
+        Only weeks with at least one transaction are returned.
+        """
+        account_table = self.model._meta.get_field(
+            'account').rel.to._meta.db_table
+        sql = """
+            SELECT weeks.week, accounts.total - COALESCE(SUM(weeks.delta)
+                OVER (ORDER BY weeks.week DESC
+                      ROWS BETWEEN UNBOUNDED PRECEDING AND 1 PRECEDING), 0)
+            FROM (
+                SELECT DATE_TRUNC('week', t.date::timestamp)::date AS week,
+                       SUM(t.amount) AS delta
+                FROM {transaction} t
+                WHERE t.owner_id = %s
+                GROUP BY 1
+            ) AS weeks, (
+                SELECT SUM(amount) AS total
+                FROM {account}
+                WHERE owner_id = %s
+            ) AS accounts
+            ORDER BY weeks.week
+        """.format(transaction=self.model._meta.db_table,
+                   account=account_table)
+        return self._fetch(sql, [owner_id, owner_id])
+
+    def monthly_sums(self, owner_id):
+        """Return a list of couples (month, sum) ordered by month, where
+        `month` is the first day of the month and `sum` is the total amount
+        of the owner's transactions within that month.
+        Only months with at least one transaction are returned.
+        """
+        sql = """
+            SELECT DATE_TRUNC('month', t.date::timestamp)::date AS month,
+                   SUM(t.amount)
+            FROM {transaction} t
+            WHERE t.owner_id = %s
+            GROUP BY 1
+            ORDER BY 1
+        """.format(transaction=self.model._meta.db_table)
+        return self._fetch(sql, [owner_id])
+
+    def update_balances(self, transactions, reverse=False):
+        """Apply the amounts of the given transactions to the balances of
+        their accounts and boxes, or revert them if `reverse` is True.
+        This must be called within an atomic block.
+        """
+        account_deltas = defaultdict(Decimal)
+        box_deltas = defaultdict(Decimal)
+        for transaction in transactions:
+            amount = -transaction.amount if reverse else transaction.amount
+            account_deltas[transaction.account_id] += Decimal(amount)
+            box_deltas[transaction.box_id] += Decimal(amount)
+        self.apply_deltas(account_deltas, box_deltas)
+
+    def apply_deltas(self, account_deltas, box_deltas):
+        """Add the given amounts to the balances of the accounts and boxes.
+        Both arguments map pks to amounts. There is a single `UPDATE` per
+        account and per box, and rows are always locked in the same order
+        (accounts then boxes, by increasing pk) so that concurrent postings
+        cannot deadlock.
+        This must be called within an atomic block, and as no signal is
+        sent, the cache of the owners must be invalidated by the caller.
+        """
+        for field_name, deltas in [('account', account_deltas),
+                                   ('box', box_deltas)]:
+            model = self.model._meta.get_field(field_name).rel.to
+            for pk in sorted(deltas):
+                if deltas[pk]:
+                    model.objects.filter(pk=pk).update(
+                        amount=F('amount') + deltas[pk])
+
+    def revert(self, transactions):
+        """Revert the effect of the given transactions on the balances and
+        the daily balances, before they are deleted. Their series buckets
+        are reverted once they are deleted, by a signal.
+        This must be called within an atomic block.
+        """
+        from .models import DailyBalance
+        self.update_balances(transactions, reverse=True)
+        for transaction in transactions:
+            DailyBalance.objects.post(transaction.account_id,
+                                      transaction.date, -transaction.amount)
+
+    def post(self, box, amount, from_account=None, from_other='',
+             to_account=None, to_other='', **kwargs):
+        """Post a transaction of `amount` from the debtor to the creditor,
+        at least one of them being an account, and return its legs.
+        The legs are grouped by a journal entry and written along with the
+        balances within a single atomic block, with one `INSERT` for all the
+        legs.
+        """
+        amount = abs(amount)
+        legs = []
+        if from_account:
+            legs.append(self.model(
+                owner_id=from_account.owner_id, account=from_account,
+                box=box, other=str(to_account or to_other), amount=-amount,
+                **kwargs))
+        if to_account:
+            legs.append(self.model(
+                owner_id=to_account.owner_id, account=to_account, box=box,
+                other=str(from_account or from_other), amount=amount,
+                **kwargs))
+        from .models import Counterparty, SeriesBucket
+        entry_model = self.model._meta.get_field('entry').rel.to
+        with atomic():
+            entry_model.objects.open([legs])
+            self.update_balances(legs)
+            self.bulk_create(legs)
+            for leg in legs:
+                leg.post_daily_balance()
+            SeriesBucket.objects.add(legs)
+            if not (from_account and to_account):
+                Counterparty.objects.record(legs)
+        invalidate(*[leg.owner_id for leg in legs])
+        return legs
+
+
+class BoxManager(models.Manager):
+
+    def tree(self, owner_id):
+        """Return the boxes of the user as a list ordered depth-first, in a
+        single query. Each box is annotated with:
+        - `depth`: 0 for root boxes, 1 for their subboxes and so on
+        - `parent_box_name`: the name of the parent box, if any
+        - `subtree_amount`: the amount of the box and all its subboxes
+        - `fill_rate`: `subtree_amount` relative to `value`, if any
+        """
+        sql = """
+            WITH RECURSIVE tree (id, depth, path) AS (
+                SELECT id, 0, ARRAY[name::text]
+                FROM {box}
+                WHERE owner_id = %s AND parent_box_id IS NULL
+                UNION ALL
+                SELECT b.id, t.depth + 1, t.path || b.name::text
+                FROM {box} b
+                INNER JOIN tree t ON b.parent_box_id = t.id
+                WHERE b.owner_id = %s
+            ), closure (ancestor_id, id) AS (
+                SELECT id, id FROM tree
+                UNION ALL
+                SELECT c.ancestor_id, b.id
+                FROM closure c
+                INNER JOIN {box} b ON b.parent_box_id = c.id
+                WHERE b.owner_id = %s
+            )
+            SELECT b.*, t.depth, p.name AS parent_box_name,
+                   s.subtree_amount
+            FROM tree t
+            INNER JOIN {box} b ON b.id = t.id
+            LEFT OUTER JOIN {box} p ON p.id = b.parent_box_id
+            INNER JOIN (
+                SELECT c.ancestor_id, SUM(b.amount) AS subtree_amount
+                FROM closure c
+                INNER JOIN {box} b ON b.id = c.id
+                GROUP BY c.ancestor_id
+            ) s ON s.ancestor_id = t.id
+            ORDER BY t.path
+        """.format(box=self.model._meta.db_table)
+        boxes = list(self.raw(sql, [owner_id, owner_id, owner_id]))
+        for box in boxes:
+            box.fill_rate = box.subtree_amount / box.value if box.value \
+                else None
+        return boxes
+
+
+class BoxTransferManager(models.Manager):
+
+    def transfer(self, from_box, legs, **kwargs):
+        """Transfer money from `from_box` to many boxes at once and return
+        the transfers.
+        - `legs`: a list of couples (to_box, amount)
+        Transfers are inserted with a single `INSERT` and the amounts of all
+        the boxes involved are updated with a single conditional `UPDATE`,
+        once the boxes are locked by increasing pk so that concurrent
+        transfers cannot deadlock.
+        """
+        transfers = [
+            self.model(from_box=from_box, to_box=to_box, amount=amount,
+                       **kwargs)
+            for to_box, amount in legs
+        ]
+        deltas = defaultdict(Decimal)
+        for transfer in transfers:
+            deltas[from_box.pk] -= Decimal(transfer.amount)
+            deltas[transfer.to_box.pk] += Decimal(transfer.amount)
+        box_model = self.model._meta.get_field('from_box').rel.to
+        with atomic():
+            self.bulk_create(transfers)
+            boxes = box_model.objects.filter(pk__in=deltas)
+            list(boxes.order_by('pk').select_for_update().values_list(
+                'pk', flat=True))
+            boxes.update(
+                amount=F('amount') + Case(
+                    *[When(pk=pk, then=Value(delta))
+                      for pk, delta in sorted(deltas.items())],
+                    output_field=DecimalField(max_digits=13,
+                                              decimal_places=2)))
+        invalidate(from_box.owner_id,
+                   *[transfer.to_box.owner_id for transfer in transfers])
+        return transfers
+
+    def split(self, amount, percentages):
+        """Return the legs to transfer the given percentages of `amount`.
+        - `percentages`: a list of couples (to_box, percentage)
+        Shares are rounded down to the cent, and the remaining cents go to
+        the last leg, so that the total is the rounded percentage of
+        `amount`.
+        """
+        cent = Decimal('0.01')
+        amount = Decimal(amount)
+        total = (amount * sum(Decimal(p) for b, p in percentages) / 100)
+        total = total.quantize(cent)
+        legs = [
+            (box, (amount * Decimal(percentage) / 100).quantize(
+                cent, rounding=ROUND_DOWN))
+            for box, percentage in percentages
+        ]
+        if legs:
+            box, last = legs[-1]
+            legs[-1] = (box, last + total - sum(a for b, a in legs))
+        return legs
+
+
+class RecurringTransactionManager(models.Manager):
+
+    def due(self, until):
+        """Return the recurring transactions having occurrences to
+        materialize until the given date.
+        """
+        return self.filter(next_date__lte=until).filter(
+            Q(end_date__isnull=True) | Q(next_date__lte=F('end_date')))
+
+    def materialize(self, until, batch_size=500):
+        """Create the transactions of all the occurrences due until the
+        given date and return how many were created.
+        Recurring transactions are processed by batches, each of them in
+        its own atomic block with one `INSERT` for all the transactions,
+        one `UPDATE` per account and per box, one statement for the daily
+        balances and one `UPDATE` to advance the recurring transactions.
+        Thus an interrupted run can just be started again.
+        """
+        from .models import (
+            Counterparty, DailyBalance, JournalEntry, SeriesBucket,
+            Transaction,
+        )
+        count = 0
+        last_pk = 0
+        while True:
+            with atomic():
+                batch = list(self.due(until).filter(pk__gt=last_pk).order_by(
+                    'pk').select_for_update()[:batch_size])
+                if not batch:
+                    break
+                last_pk = batch[-1].pk
+                transactions = []
+                for recurring in batch:
+                    transactions.extend(recurring.materialize(until))
+                JournalEntry.objects.open([[t] for t in transactions])
+                Transaction.objects.bulk_create(transactions)
+                Transaction.objects.update_balances(transactions)
+                Counterparty.objects.record(transactions)
+                SeriesBucket.objects.add(transactions)
+                self.filter(pk__in=[r.pk for r in batch]).update(
+                    count=Case(
+                        *[When(pk=r.pk, then=Value(r.count)) for r in batch],
+                        output_field=IntegerField()),
+                    next_date=Case(
+                        *[When(pk=r.pk, then=Value(r.next_date))
+                          for r in batch],
+                        output_field=DateField()))
+                DailyBalance.objects.post_many(transactions)
+            invalidate(*[r.owner_id for r in batch])
+            count += len(transactions)
+        return count
+
+
+class CreditManager(models.Manager.from_queryset(TransactionQuerySet)):
 
     def get_queryset(self):
         return super().get_queryset().filter(amount__gt=0)
 
     def create(self, account, box, other, amount, **kwargs):
-        credit = self.model(account=account, box=box, other=str(other),
-                           amount=abs(amount), **kwargs)
-        account.credit(abs(amount))
-        account.save()
-        box.credit(abs(amount))
-        box.save()
-        credit.save()
+        from .models import Counterparty
+        credit = self.model(owner_id=account.owner_id, account=account,
+                            box=box, other=str(other), amount=abs(amount),
+                            **kwargs)
+        with atomic():
+            self.model.objects.update_balances([credit])
+            credit.save()
+            credit.post_daily_balance()
+            if not isinstance(other, models.Model):
+                Counterparty.objects.record([credit])
         return credit
 
 
-class DebitManager(models.Manager):
+class DebitManager(models.Manager.from_queryset(TransactionQuerySet)):
 
     def get_queryset(self):
         return super().get_queryset().filter(amount__lt=0)
 
     def create(self, account, box, other, amount, **kwargs):
-        debit = self.model(account=account, box=box, other=str(other),
-                           amount=-abs(amount), **kwargs)
-        account.debit(abs(amount))
-        account.save()
-        box.debit(abs(amount))
-        box.save()
-        debit.save()
+        from .models import Counterparty
+        debit = self.model(owner_id=account.owner_id, account=account,
+                           box=box, other=str(other), amount=-abs(amount),
+                           **kwargs)
+        with atomic():
+            self.model.objects.update_balances([debit])
+            debit.save()
+            debit.post_daily_balance()
+            if not isinstance(other, models.Model):
+                Counterparty.objects.record([debit])
         return debit
+
+
+class JournalEntryManager(models.Manager):
+
+    def open(self, groups):
+        """Create one entry per group of legs with a single `INSERT` and
+        link the legs to it, before they are saved.
+        - `groups`: a list of lists of transactions, the first leg of a group
+          giving the owner, the date and the description of its entry
+        """
+        groups = [legs for legs in groups if legs]
+        if not groups:
+            return
+        values = []
+        params = []
+        for legs in groups:
+            values.append('(%s, %s::date, %s, NOW())')
+            params.extend([legs[0].owner_id, legs[0].date,
+                           legs[0].short_description])
+        sql = """
+            INSERT INTO {table} (owner_id, date, short_description, created)
+            VALUES {values}
+            RETURNING id
+        """.format(table=self.model._meta.db_table, values=', '.join(values))
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            pks = [pk for pk, in cursor.fetchall()]
+        for legs, pk in zip(groups, pks):
+            for leg in legs:
+                leg.entry_id = pk
+
+
+class CounterpartyManager(models.Manager):
+
+    def record(self, transactions):
+        """Record the counterparties of the given transactions, creating
+        the unknown ones and bumping the usage count and the last use date
+        of the others, in a single statement which is safe against
+        concurrent postings (see `_upsert()`).
+        """
+        usages = defaultdict(lambda: [0, None])
+        for transaction in transactions:
+            if not transaction.other:
+                continue
+            usage = usages[transaction.owner_id, transaction.other]
+            usage[0] += 1
+            if usage[1] is None or transaction.date > usage[1]:
+                usage[1] = transaction.date
+        if not usages:
+            return
+        values = []
+        params = []
+        for (owner_id, name), (count, last_used) in sorted(usages.items()):
+            values.append('(%s::integer, %s::varchar, %s::integer, %s::date)')
+            params.extend([owner_id, name, count, last_used])
+        sql = """
+            WITH usages (owner_id, name, count, last_used) AS (
+                VALUES {values}
+            ), updated AS (
+                UPDATE {table} c
+                SET usage_count = c.usage_count + u.count,
+                    last_used = GREATEST(c.last_used, u.last_used)
+                FROM usages u
+                WHERE c.owner_id = u.owner_id AND c.name = u.name
+                RETURNING c.owner_id, c.name
+            )
+            INSERT INTO {table} (owner_id, name, usage_count, last_used)
+            SELECT u.owner_id, u.name, u.count, u.last_used
+            FROM usages u
+            WHERE NOT EXISTS (
+                SELECT 1 FROM updated
+                WHERE updated.owner_id = u.owner_id
+                  AND updated.name = u.name
+            )
+        """.format(values=', '.join(values), table=self.model._meta.db_table)
+        _upsert(sql, params)
+
+    def suggest(self, owner_id, term, limit=10):
+        """Return the names of the user's most used counterparties starting
+        with `term`.
+        """
+        return list(self.filter(
+            owner_id=owner_id, name__istartswith=term).order_by(
+                '-usage_count', '-last_used').values_list(
+                    'name', flat=True)[:limit])
+
+
+class SeriesBucketManager(models.Manager):
+
+    def add(self, transactions, reverse=False):
+        """Add the amounts of the given transactions to their week and month
+        buckets, or remove them if `reverse` is True, with a single
+        statement whatever the number of transactions. Emptied buckets are
+        deleted.
+        """
+        from .models import Transaction
+        date_field = Transaction._meta.get_field('date')
+        sign = -1 if reverse else 1
+        deltas = defaultdict(lambda: [Decimal(0), 0])
+        for transaction in transactions:
+            day = date_field.to_python(transaction.date)
+            for period, start in self.model.get_starts(day):
+                delta = deltas[transaction.owner_id, period, start]
+                delta[0] += sign * Decimal(transaction.amount)
+                delta[1] += sign
+        if not deltas:
+            return
+        values = []
+        params = []
+        for key, (delta, count) in sorted(deltas.items()):
+            values.append('(%s::integer, %s::varchar, %s::date, '
+                          '%s::numeric, %s::integer)')
+            params.extend(list(key) + [delta, count])
+        sql = """
+            WITH deltas (owner_id, period, start, delta, count) AS (
+                VALUES {values}
+            ), updated AS (
+                UPDATE {table} b
+                SET delta = b.delta + d.delta, count = b.count + d.count
+                FROM deltas d
+                WHERE b.owner_id = d.owner_id AND b.period = d.period
+                  AND b.start = d.start
+                RETURNING b.owner_id, b.period, b.start
+            )
+            INSERT INTO {table} (owner_id, period, start, delta, count)
+            SELECT d.owner_id, d.period, d.start, d.delta, d.count
+            FROM deltas d
+            WHERE d.count > 0 AND NOT EXISTS (
+                SELECT 1 FROM updated u
+                WHERE u.owner_id = d.owner_id AND u.period = d.period
+                  AND u.start = d.start
+            )
+        """.format(values=', '.join(values), table=self.model._meta.db_table)
+        with atomic():
+            # Concurrent writes of the same user may both create a new
+            # bucket: the loser's statement is rolled back to a savepoint
+            # and retried, then updating the winner's row (see `_upsert()`).
+            # A bucket deleted concurrently is skipped by the `UPDATE` and
+            # created again by the `INSERT`. Removals only apply to existing
+            # buckets: a missing one, such as a bucket deleted along with its
+            # owner, has nothing left to revert.
+            _upsert(sql, params)
+            if reverse:
+                self.filter(owner_id__in={key[0] for key in deltas},
+                            count__lte=0).delete()
+
+    def deltas(self, owner_id, period, since=None):
+        """Return a list of couples (start, delta) of the user's buckets of
+        the given period, ordered by start.
+        """
+        queryset = self.filter(owner_id=owner_id, period=period)
+        if since is not None:
+            queryset = queryset.filter(start__gte=since)
+        return list(queryset.order_by('start').values_list('start', 'delta'))
+
+    def rebuild(self, owner_ids=None):
+        """Recompute the buckets from the transactions, for the given users
+        or for every user.
+        """
+        from .models import Transaction
+        params = []
+        where = ''
+        queryset = self.all()
+        if owner_ids is not None:
+            owner_ids = list(owner_ids)
+            queryset = queryset.filter(owner_id__in=owner_ids)
+            where = 'WHERE owner_id = ANY(%s)'
+            params.append(owner_ids)
+        sql = """
+            INSERT INTO {table} (owner_id, period, start, delta, count)
+            SELECT owner_id, %s, DATE_TRUNC(%s, date::timestamp)::date,
+                   SUM(amount), COUNT(*)
+            FROM {transaction}
+            {where}
+            GROUP BY 1, 2, 3
+        """.format(table=self.model._meta.db_table,
+                   transaction=Transaction._meta.db_table, where=where)
+        with atomic():
+            queryset.delete()
+            with connection.cursor() as cursor:
+                for period in (self.model.WEEK, self.model.MONTH):
+                    cursor.execute(sql, [period, period] + params)
+
+
+class DailyBalanceManager(models.Manager):
+
+    def post(self, account_id, date, amount):
+        """Report a movement of `amount` on the given account at `date`.
+        This must be called once the account amount has been updated.
+        """
+        with atomic():
+            self.filter(account_id=account_id, date__gte=date).update(
+                amount=F('amount') + amount)
+            if self.filter(account_id=account_id, date=date).update(
+                    delta=F('delta') + amount):
+                return
+            # No snapshot yet for this day, its closing balance is the
+            # opening balance of the next snapshot.
+            self.create(account_id=account_id, date=date, delta=amount,
+                        amount=self._opening_balance(account_id, date))
+
+    def post_many(self, transactions):
+        """Report the given transactions to the snapshots with a single
+        statement, whatever their number: the movements are summed per
+        account and per day, existing snapshots are shifted and the missing
+        ones are created.
+        This must be called once the account amounts have been updated,
+        which also locks them.
+        """
+        from .models import Transaction
+        date_field = Transaction._meta.get_field('date')
+        deltas = defaultdict(Decimal)
+        for transaction in transactions:
+            day = date_field.to_python(transaction.date)
+            deltas[transaction.account_id, day] += Decimal(transaction.amount)
+        if not deltas:
+            return
+        values = []
+        params = []
+        for key, delta in sorted(deltas.items()):
+            values.append('(%s::integer, %s::date, %s::numeric)')
+            params.extend(list(key) + [delta])
+        account_meta = self.model._meta.get_field('account').rel.to._meta
+        # Both parts see the snapshots as they were before the statement: the
+        # closing balance of a new day is the current amount minus all the
+        # movements after that day, the ones of the batch included.
+        sql = """
+            WITH deltas (account_id, date, delta) AS (
+                VALUES {values}
+            ), shifted AS (
+                UPDATE {daily_balance} s
+                SET amount = s.amount + x.shift, delta = s.delta + x.delta
+                FROM (
+                    SELECT o.id, SUM(d.delta) AS shift,
+                           SUM(CASE WHEN d.date = o.date THEN d.delta
+                                    ELSE 0 END) AS delta
+                    FROM {daily_balance} o
+                    INNER JOIN deltas d ON d.account_id = o.account_id
+                                       AND d.date <= o.date
+                    GROUP BY o.id
+                ) x
+                WHERE x.id = s.id
+            )
+            INSERT INTO {daily_balance} (account_id, date, delta, amount)
+            SELECT d.account_id, d.date, d.delta, a.amount
+                - COALESCE((SELECT SUM(o.delta) FROM {daily_balance} o
+                            WHERE o.account_id = d.account_id
+                              AND o.date > d.date), 0)
+                - COALESCE((SELECT SUM(n.delta) FROM deltas n
+                            WHERE n.account_id = d.account_id
+                              AND n.date > d.date), 0)
+            FROM deltas d
+            INNER JOIN {account} a ON a.id = d.account_id
+            WHERE NOT EXISTS (
+                SELECT 1 FROM {daily_balance} o
+                WHERE o.account_id = d.account_id AND o.date = d.date
+            )
+        """.format(values=', '.join(values),
+                   daily_balance=self.model._meta.db_table,
+                   account=account_meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+
+    def _opening_balance(self, account_id, date):
+        """Return the balance of the account right after `date`, supposing
+        there is no snapshot at `date` itself.
+        """
+        following = self.filter(account_id=account_id, date__gt=date)
+        following = following.order_by('date').values_list(
+            'amount', 'delta').first()
+        if following is not None:
+            return following[0] - following[1]
+        account_model = self.model._meta.get_field('account').rel.to
+        return account_model.objects.filter(pk=account_id).values_list(
+            'amount', flat=True).get()
+
+    def balance_at(self, account_id, date):
+        """Return the balance of the account at the end of `date`."""
+        balance = self.filter(account_id=account_id, date__lte=date)
+        balance = balance.order_by('-date').values_list(
+            'amount', flat=True).first()
+        if balance is not None:
+            return balance
+        return self._opening_balance(account_id, date)
+
+    def rebuild(self, account_ids=None):
+        """Recompute snapshots from transactions, for the given accounts or
+        for every account.
+        """
+        from .models import Transaction
+        account_meta = self.model._meta.get_field('account').rel.to._meta
+        sql = """
+            INSERT INTO {daily_balance} (account_id, date, delta, amount)
+            SELECT days.account_id, days.date, days.delta,
+                   a.amount - COALESCE(SUM(days.delta) OVER (
+                       PARTITION BY days.account_id ORDER BY days.date DESC
+                       ROWS BETWEEN UNBOUNDED PRECEDING AND 1 PRECEDING), 0)
+            FROM (
+                SELECT account_id, date, SUM(amount) AS delta
+                FROM {transaction}
+                {where}
+                GROUP BY account_id, date
+            ) AS days
+            INNER JOIN {account} a ON a.id = days.account_id
+        """
+        params = []
+        where = ''
+        queryset = self.all()
+        if account_ids is not None:
+            account_ids = list(account_ids)
+            queryset = queryset.filter(account_id__in=account_ids)
+            where = 'WHERE account_id = ANY(%s)'
+            params.append(account_ids)
+        sql = sql.format(daily_balance=self.model._meta.db_table,
+                         transaction=Transaction._meta.db_table,
+                         account=account_meta.db_table,
+                         where=where)
+        with atomic():
+            queryset.delete()
+            with connection.cursor() as cursor:
+                cursor.execute(sql, params)
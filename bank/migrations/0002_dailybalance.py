@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+REBUILD_DAILY_BALANCES = """
+    INSERT INTO bank_dailybalance (account_id, date, delta, amount)
+    SELECT days.account_id, days.date, days.delta,
+           a.amount - COALESCE(SUM(days.delta) OVER (
+               PARTITION BY days.account_id ORDER BY days.date DESC
+               ROWS BETWEEN UNBOUNDED PRECEDING AND 1 PRECEDING), 0)
+    FROM (
+        SELECT account_id, date, SUM(amount) AS delta
+        FROM bank_transaction
+        GROUP BY account_id, date
+    ) AS days
+    INNER JOIN bank_account a ON a.id = days.account_id
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bank', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyBalance',
+            fields=[
+                ('id', models.AutoField(auto_created=True, verbose_name='ID', serialize=False, primary_key=True)),
+                ('date', models.DateField(verbose_name='date')),
+                ('delta', models.DecimalField(decimal_places=2, verbose_name='delta', max_digits=13, help_text='The sum of the transactions of the day.')),
+                ('amount', models.DecimalField(decimal_places=2, verbose_name='amount', max_digits=13, help_text='The balance of the account at the end of the day.')),
+                ('account', models.ForeignKey(to='bank.Account', related_name='daily_balances', verbose_name='account')),
+            ],
+            options={
+                'verbose_name_plural': 'daily balances',
+                'verbose_name': 'daily balance',
+            },
+        ),
+        migrations.AlterUniqueTogether(
+            name='dailybalance',
+            unique_together=set([('account', 'date')]),
+        ),
+        migrations.RunSQL(REBUILD_DAILY_BALANCES, migrations.RunSQL.noop),
+    ]
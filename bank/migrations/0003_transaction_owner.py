@@ -0,0 +1,21 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+from django.conf import settings
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('bank', '0002_dailybalance'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='transaction',
+            name='owner',
+            field=models.ForeignKey(to=settings.AUTH_USER_MODEL, null=True, editable=False, related_name='transactions', verbose_name='owner', help_text='The owner of the account, denormalized for faster lookups.'),
+        ),
+    ]
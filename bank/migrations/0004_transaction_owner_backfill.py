@@ -0,0 +1,27 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+
+def backfill_transaction_owner(apps, schema_editor):
+    """Copy the account owner to the transactions."""
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("""
+            UPDATE bank_transaction t
+            SET owner_id = a.owner_id
+            FROM bank_account a
+            WHERE a.id = t.account_id AND t.owner_id IS NULL
+        """)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bank', '0003_transaction_owner'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_transaction_owner,
+                             migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+from django.conf import settings
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('bank', '0004_transaction_owner_backfill'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='transaction',
+            name='owner',
+            field=models.ForeignKey(to=settings.AUTH_USER_MODEL, editable=False, related_name='transactions', verbose_name='owner', help_text='The owner of the account, denormalized for faster lookups.'),
+        ),
+        migrations.AlterIndexTogether(
+            name='transaction',
+            index_together=set([('owner', 'date', 'id')]),
+        ),
+        migrations.AlterIndexTogether(
+            name='box',
+            index_together=set([('owner', 'parent_box', 'name')]),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+from django.conf import settings
+import django.core.validators
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('bank', '0005_owner_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecurringTransaction',
+            fields=[
+                ('id', models.AutoField(auto_created=True, verbose_name='ID', serialize=False, primary_key=True)),
+                ('other', models.CharField(max_length=50, verbose_name='other account')),
+                ('amount', models.DecimalField(decimal_places=2, verbose_name='transaction amount', max_digits=13, help_text='Negative amounts are debits.')),
+                ('short_description', models.CharField(blank=True, max_length=100, verbose_name='short_description')),
+                ('frequency', models.CharField(max_length=7, verbose_name='frequency', choices=[('weekly', 'weekly'), ('monthly', 'monthly'), ('yearly', 'yearly')])),
+                ('interval', models.PositiveSmallIntegerField(default=1, validators=[django.core.validators.MinValueValidator(1)], verbose_name='interval', help_text='The number of weeks, months or years between occurrences.')),
+                ('start_date', models.DateField(verbose_name='start date')),
+                ('end_date', models.DateField(null=True, blank=True, verbose_name='end date')),
+                ('count', models.PositiveIntegerField(default=0, editable=False, verbose_name='number of occurrences')),
+                ('next_date', models.DateField(editable=False, db_index=True, verbose_name='next occurrence')),
+                ('account', models.ForeignKey(to='bank.Account', related_name='recurring_transactions', verbose_name='account')),
+                ('box', models.ForeignKey(to='bank.Box', related_name='recurring_transactions', verbose_name='box')),
+                ('owner', models.ForeignKey(to=settings.AUTH_USER_MODEL, editable=False, related_name='recurring_transactions', verbose_name='owner')),
+            ],
+            options={
+                'verbose_name_plural': 'recurring transactions',
+                'verbose_name': 'recurring transaction',
+            },
+        ),
+    ]
@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+from django.conf import settings
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('bank', '0006_recurringtransaction'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='JournalEntry',
+            fields=[
+                ('id', models.AutoField(auto_created=True, verbose_name='ID', serialize=False, primary_key=True)),
+                ('date', models.DateField(default=django.utils.timezone.now, verbose_name='transaction date')),
+                ('short_description', models.CharField(blank=True, max_length=100, verbose_name='short_description')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='creation date')),
+                ('owner', models.ForeignKey(to=settings.AUTH_USER_MODEL, related_name='journal_entries', verbose_name='owner')),
+            ],
+            options={
+                'verbose_name': 'journal entry',
+                'verbose_name_plural': 'journal entries',
+            },
+        ),
+        migrations.AddField(
+            model_name='transaction',
+            name='entry',
+            field=models.ForeignKey(null=True, to='bank.JournalEntry', on_delete=django.db.models.deletion.DO_NOTHING, blank=True, editable=False, related_name='legs', verbose_name='journal entry'),
+        ),
+        # Give their own entry to the existing transactions. The foreign
+        # key is deferred, so the ids can be taken before the rows exist.
+        migrations.RunSQL(
+            """
+            UPDATE bank_transaction
+            SET entry_id = nextval(
+                pg_get_serial_sequence('bank_journalentry', 'id'));
+            INSERT INTO bank_journalentry (id, owner_id, date,
+                                           short_description, created)
+            SELECT entry_id, owner_id, date, short_description, NOW()
+            FROM bank_transaction;
+            """,
+            migrations.RunSQL.noop,
+        ),
+    ]
@@ -0,0 +1,26 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.contrib.postgres.operations import CreateExtension
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bank', '0007_ledger'),
+    ]
+
+    operations = [
+        CreateExtension('pg_trgm'),
+        migrations.RunSQL(
+            "CREATE INDEX bank_transaction_other_trgm "
+            "ON bank_transaction USING gin (other gin_trgm_ops)",
+            "DROP INDEX bank_transaction_other_trgm",
+        ),
+        migrations.RunSQL(
+            "CREATE INDEX bank_transaction_short_description_trgm "
+            "ON bank_transaction USING gin (short_description gin_trgm_ops)",
+            "DROP INDEX bank_transaction_short_description_trgm",
+        ),
+    ]
@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+from django.conf import settings
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('bank', '0008_transaction_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Counterparty',
+            fields=[
+                ('id', models.AutoField(auto_created=True, verbose_name='ID', serialize=False, primary_key=True)),
+                ('name', models.CharField(max_length=50, verbose_name='name')),
+                ('usage_count', models.PositiveIntegerField(default=0, verbose_name='usage count')),
+                ('last_used', models.DateField(verbose_name='last used')),
+                ('owner', models.ForeignKey(to=settings.AUTH_USER_MODEL, related_name='counterparties', verbose_name='owner')),
+            ],
+            options={
+                'verbose_name': 'counterparty',
+                'verbose_name_plural': 'counterparties',
+            },
+        ),
+        migrations.AlterUniqueTogether(
+            name='counterparty',
+            unique_together=set([('owner', 'name')]),
+        ),
+        migrations.RunSQL(
+            """
+            INSERT INTO bank_counterparty (owner_id, name, usage_count,
+                                           last_used)
+            SELECT t.owner_id, t.other, COUNT(*), MAX(t.date)
+            FROM bank_transaction t
+            WHERE t.other <> '' AND NOT EXISTS (
+                SELECT 1 FROM bank_account a
+                WHERE a.owner_id = t.owner_id AND a.name = t.other
+            )
+            GROUP BY t.owner_id, t.other
+            """,
+            "DELETE FROM bank_counterparty",
+        ),
+    ]
@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+from django.conf import settings
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('bank', '0009_counterparty'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SeriesBucket',
+            fields=[
+                ('id', models.AutoField(auto_created=True, verbose_name='ID', serialize=False, primary_key=True)),
+                ('period', models.CharField(max_length=5, verbose_name='period', choices=[('week', 'week'), ('month', 'month')])),
+                ('start', models.DateField(verbose_name='start date')),
+                ('delta', models.DecimalField(max_digits=13, decimal_places=2, verbose_name='delta')),
+                ('count', models.PositiveIntegerField(verbose_name='number of transactions')),
+                ('owner', models.ForeignKey(to=settings.AUTH_USER_MODEL, related_name='series_buckets', verbose_name='owner')),
+            ],
+            options={
+                'verbose_name': 'series bucket',
+                'verbose_name_plural': 'series buckets',
+            },
+        ),
+        migrations.AlterUniqueTogether(
+            name='seriesbucket',
+            unique_together=set([('owner', 'period', 'start')]),
+        ),
+        migrations.RunSQL(
+            """
+            INSERT INTO bank_seriesbucket (owner_id, period, start, delta,
+                                           count)
+            SELECT owner_id, period,
+                   DATE_TRUNC(period, date::timestamp)::date, SUM(amount),
+                   COUNT(*)
+            FROM bank_transaction, (VALUES ('week'), ('month')) p (period)
+            GROUP BY 1, 2, 3
+            """,
+            "DELETE FROM bank_seriesbucket",
+        ),
+    ]
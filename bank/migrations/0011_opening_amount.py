@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bank', '0010_seriesbucket'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='account',
+            name='opening_amount',
+            field=models.DecimalField(default=0, editable=False, max_digits=13, decimal_places=2, verbose_name='opening amount', help_text='The amount at creation, from which the balance is reconciled with the transactions.'),
+        ),
+        migrations.AddField(
+            model_name='box',
+            name='opening_amount',
+            field=models.DecimalField(default=0, editable=False, max_digits=13, decimal_places=2, verbose_name='opening amount', help_text='The amount at creation, from which the balance is reconciled with the transactions and transfers.'),
+        ),
+        # The current amounts are supposed to be balanced, the opening
+        # amounts are what is left once the flows are taken out.
+        migrations.RunSQL(
+            """
+            UPDATE bank_account a
+            SET opening_amount = a.amount
+                - COALESCE((SELECT SUM(amount) FROM bank_transaction
+                            WHERE account_id = a.id), 0)
+            """,
+            migrations.RunSQL.noop,
+        ),
+        migrations.RunSQL(
+            """
+            UPDATE bank_box b
+            SET opening_amount = b.amount
+                - COALESCE((SELECT SUM(amount) FROM bank_transaction
+                            WHERE box_id = b.id), 0)
+                - COALESCE((SELECT SUM(amount) FROM bank_boxtransfer
+                            WHERE to_box_id = b.id), 0)
+                + COALESCE((SELECT SUM(amount) FROM bank_boxtransfer
+                            WHERE from_box_id = b.id), 0)
+            """,
+            migrations.RunSQL.noop,
+        ),
+    ]
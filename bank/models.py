@@ -1,4 +1,7 @@
 # -*- coding: utf-8 -*-
+from calendar import monthrange
+from datetime import date, timedelta
+
 from django.conf import settings
 from django.core.validators import MinValueValidator
 from django.db import models
@@ -6,7 +9,12 @@ from django.db.models import F
 from django.utils import timezone
 from django.utils.translation import ugettext_lazy as _
 
-from .managers import DebitManager, CreditManager, TransactionManager
+from .cache import atomic
+from .managers import (
+    BoxManager, BoxTransferManager, CounterpartyManager, DailyBalanceManager,
+    DebitManager, CreditManager, JournalEntryManager,
+    RecurringTransactionManager, SeriesBucketManager, TransactionManager,
+)
 
 
 class Account(models.Model):
@@ -29,6 +37,11 @@ class Account(models.Model):
     name = models.CharField(verbose_name=_("name"), max_length=30)
     amount = models.DecimalField(
         verbose_name=_("amount"), max_digits=13, decimal_places=2)
+    opening_amount = models.DecimalField(
+        verbose_name=_("opening amount"), max_digits=13, decimal_places=2,
+        default=0, editable=False, help_text=_(
+            "The amount at creation, from which the balance is reconciled "
+            "with the transactions."))
     iban = models.CharField(verbose_name=_("IBAN"), max_length=34, blank=True)
     bic = models.CharField(verbose_name=_("BIC"), max_length=11, blank=True)
     is_virtual = models.BooleanField(
@@ -39,6 +52,11 @@ class Account(models.Model):
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        if self.pk is None:
+            self.opening_amount = self.amount
+        super().save(*args, **kwargs)
+
     def credit(self, amount):
         """Credit the account of the given amount."""
         assert amount > 0
@@ -68,6 +86,7 @@ class Box(models.Model):
         verbose_name = _("box")
         verbose_name_plural = _("boxes")
         unique_together = [('owner', 'name')]
+        index_together = [('owner', 'parent_box', 'name')]
 
     owner = models.ForeignKey(
         settings.AUTH_USER_MODEL, verbose_name=_("owner"),
@@ -77,6 +96,11 @@ class Box(models.Model):
         verbose_name=_("short description"), max_length=100)
     amount = models.DecimalField(
         verbose_name=_("amount"), max_digits=13, decimal_places=2)
+    opening_amount = models.DecimalField(
+        verbose_name=_("opening amount"), max_digits=13, decimal_places=2,
+        default=0, editable=False, help_text=_(
+            "The amount at creation, from which the balance is reconciled "
+            "with the transactions and transfers."))
     value = models.BigIntegerField(
         verbose_name=_("value"), blank=True, null=True, help_text=_(
             "This can be useful to set the expected value when the box is "
@@ -90,9 +114,16 @@ class Box(models.Model):
         'self', verbose_name=_("parent box"), related_name='subboxes',
         blank=True, null=True)
 
+    objects = BoxManager()
+
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        if self.pk is None:
+            self.opening_amount = self.amount
+        super().save(*args, **kwargs)
+
     def credit(self, amount):
         """Credit the account of the given amount."""
         assert amount > 0
@@ -104,19 +135,66 @@ class Box(models.Model):
         self.amount = F('amount') - amount
 
 
+class JournalEntry(models.Model):
+    """Group the legs of a posting, such as the debit and the credit of a
+    transfer between two accounts of the user.
+    """
+
+    class Meta:
+        verbose_name = _("journal entry")
+        verbose_name_plural = _("journal entries")
+
+    owner = models.ForeignKey(
+        settings.AUTH_USER_MODEL, verbose_name=_("owner"),
+        related_name='journal_entries')
+    date = models.DateField(
+        verbose_name=_("transaction date"), default=timezone.now)
+    short_description = models.CharField(
+        verbose_name=_("short_description"), max_length=100, blank=True)
+    created = models.DateTimeField(
+        verbose_name=_("creation date"), auto_now_add=True)
+
+    objects = JournalEntryManager()
+
+    def __str__(self):
+        return "{date}: {description}".format(
+            date=self.date, description=self.short_description)
+
+    def delete(self, *args, **kwargs):
+        """Delete the entry along with its legs and revert their effect on
+        the account and box balances.
+        """
+        with atomic():
+            legs = list(self.legs.all())
+            Transaction.objects.revert(legs)
+            self.legs.all().delete()
+            return super().delete(*args, **kwargs)
+
+
 class Transaction(models.Model):
     """Represent a transaction which is crediting or debiting an account."""
 
     class Meta:
         verbose_name = _("transaction")
         verbose_name_plural = _("transactions")
+        index_together = [('owner', 'date', 'id')]
 
+    owner = models.ForeignKey(
+        settings.AUTH_USER_MODEL, verbose_name=_("owner"),
+        related_name='transactions', editable=False, help_text=_(
+            "The owner of the account, denormalized for faster lookups."))
     account = models.ForeignKey(
         Account, verbose_name=_("account"), related_name='transactions',
         help_text=_("The account involved in the transaction."))
     box = models.ForeignKey(
         Box, verbose_name=_("box"), related_name='transactions',
         help_text=_("The box involved in the transaction."))
+    # Legs are deleted along with their entry, which reverts their balances
+    # (see `JournalEntry.delete()`). An entry whose legs went with their
+    # account or box is removed by a signal.
+    entry = models.ForeignKey(
+        JournalEntry, verbose_name=_("journal entry"), related_name='legs',
+        blank=True, null=True, editable=False, on_delete=models.DO_NOTHING)
     other = models.CharField(
         verbose_name=_("other account"), max_length=50, help_text=_(
             "The name of the other account involved in the transaction."))
@@ -147,6 +225,240 @@ class Transaction(models.Model):
                 other=self.other
             )
 
+    def save(self, *args, **kwargs):
+        if self.owner_id is None:
+            self.owner_id = self.account.owner_id
+        if self.pk is None:
+            with atomic():
+                if self.entry_id is None:
+                    JournalEntry.objects.open([[self]])
+                super().save(*args, **kwargs)
+                SeriesBucket.objects.add([self])
+            return
+        with atomic():
+            previous_date = Transaction.objects.filter(
+                pk=self.pk).values_list('date', flat=True).get()
+            super().save(*args, **kwargs)
+            if previous_date != self.date:
+                # Snapshots are written under the lock of their account,
+                # like postings take it when updating its amount.
+                list(Account.objects.select_for_update().filter(
+                    pk=self.account_id).values_list('pk', flat=True))
+                DailyBalance.objects.post(self.account_id, previous_date,
+                                          -self.amount)
+                self.post_daily_balance()
+                SeriesBucket.objects.add([Transaction(
+                    owner_id=self.owner_id, date=previous_date,
+                    amount=self.amount)], reverse=True)
+                SeriesBucket.objects.add([self])
+
+    def delete(self, *args, **kwargs):
+        """Delete the transaction along with the other legs of its journal
+        entry, so that no entry is left unbalanced, and revert their effect
+        on the account and box balances.
+        """
+        if self.entry_id is not None:
+            return self.entry.delete(*args, **kwargs)
+        with atomic():
+            Transaction.objects.revert([self])
+            return super().delete(*args, **kwargs)
+
+    def post_daily_balance(self):
+        """Report the transaction to the daily balance snapshots."""
+        DailyBalance.objects.post(self.account_id, self.date, self.amount)
+
+
+class Counterparty(models.Model):
+    """Name used by a user as the other account of transactions, along with
+    how often and how recently, to suggest it when typing a new one.
+    """
+
+    class Meta:
+        verbose_name = _("counterparty")
+        verbose_name_plural = _("counterparties")
+        unique_together = [('owner', 'name')]
+
+    owner = models.ForeignKey(
+        settings.AUTH_USER_MODEL, verbose_name=_("owner"),
+        related_name='counterparties')
+    name = models.CharField(verbose_name=_("name"), max_length=50)
+    usage_count = models.PositiveIntegerField(
+        verbose_name=_("usage count"), default=0)
+    last_used = models.DateField(verbose_name=_("last used"))
+
+    objects = CounterpartyManager()
+
+    def __str__(self):
+        return self.name
+
+
+class SeriesBucket(models.Model):
+    """Sum of the amounts of a user's transactions within a week (starting
+    on monday, as ISO weeks do) or a month, kept up to date as transactions
+    are posted, moved or deleted so that the dashboard series never have to
+    scan the transactions.
+    """
+    WEEK = 'week'
+    MONTH = 'month'
+    PERIOD_CHOICES = [
+        (WEEK, _("week")),
+        (MONTH, _("month")),
+    ]
+
+    class Meta:
+        verbose_name = _("series bucket")
+        verbose_name_plural = _("series buckets")
+        unique_together = [('owner', 'period', 'start')]
+
+    owner = models.ForeignKey(
+        settings.AUTH_USER_MODEL, verbose_name=_("owner"),
+        related_name='series_buckets')
+    period = models.CharField(verbose_name=_("period"), max_length=5,
+                              choices=PERIOD_CHOICES)
+    start = models.DateField(verbose_name=_("start date"))
+    delta = models.DecimalField(
+        verbose_name=_("delta"), max_digits=13, decimal_places=2)
+    count = models.PositiveIntegerField(
+        verbose_name=_("number of transactions"))
+
+    objects = SeriesBucketManager()
+
+    def __str__(self):
+        return "{period} {start}: {delta}€".format(
+            period=self.period, start=self.start, delta=self.delta)
+
+    @classmethod
+    def get_starts(cls, day):
+        """Return the couples (period, start) of the buckets of a date."""
+        return [
+            (cls.WEEK, day - timedelta(days=day.weekday())),
+            (cls.MONTH, day.replace(day=1)),
+        ]
+
+
+class DailyBalance(models.Model):
+    """Snapshot of the balance of an account at the end of a day.
+    There is one snapshot per account and per day having transactions, so
+    that the balance at any date can be looked up without replaying the
+    transactions.
+    """
+
+    class Meta:
+        verbose_name = _("daily balance")
+        verbose_name_plural = _("daily balances")
+        unique_together = [('account', 'date')]
+
+    account = models.ForeignKey(
+        Account, verbose_name=_("account"), related_name='daily_balances')
+    date = models.DateField(verbose_name=_("date"))
+    delta = models.DecimalField(
+        verbose_name=_("delta"), max_digits=13, decimal_places=2,
+        help_text=_("The sum of the transactions of the day."))
+    amount = models.DecimalField(
+        verbose_name=_("amount"), max_digits=13, decimal_places=2,
+        help_text=_("The balance of the account at the end of the day."))
+
+    objects = DailyBalanceManager()
+
+    def __str__(self):
+        return "{date}: {account} = {amount}€".format(
+            date=self.date, account=self.account, amount=self.amount)
+
+
+class RecurringTransaction(models.Model):
+    """Represent a transaction repeated periodically, such as a rent or a
+    wage. Occurrences are created as `Transaction` by the
+    `materialize_recurring_transactions` command.
+    """
+    WEEKLY = 'weekly'
+    MONTHLY = 'monthly'
+    YEARLY = 'yearly'
+    FREQUENCY_CHOICES = [
+        (WEEKLY, _("weekly")),
+        (MONTHLY, _("monthly")),
+        (YEARLY, _("yearly")),
+    ]
+
+    class Meta:
+        verbose_name = _("recurring transaction")
+        verbose_name_plural = _("recurring transactions")
+
+    owner = models.ForeignKey(
+        settings.AUTH_USER_MODEL, verbose_name=_("owner"),
+        related_name='recurring_transactions', editable=False)
+    account = models.ForeignKey(
+        Account, verbose_name=_("account"),
+        related_name='recurring_transactions')
+    box = models.ForeignKey(
+        Box, verbose_name=_("box"), related_name='recurring_transactions')
+    other = models.CharField(verbose_name=_("other account"), max_length=50)
+    amount = models.DecimalField(
+        verbose_name=_("transaction amount"), max_digits=13,
+        decimal_places=2, help_text=_("Negative amounts are debits."))
+    short_description = models.CharField(
+        verbose_name=_("short_description"), max_length=100, blank=True)
+    frequency = models.CharField(
+        verbose_name=_("frequency"), max_length=7, choices=FREQUENCY_CHOICES)
+    interval = models.PositiveSmallIntegerField(
+        verbose_name=_("interval"), default=1, help_text=_(
+            "The number of weeks, months or years between occurrences."),
+        validators=[
+            MinValueValidator(1),
+        ])
+    start_date = models.DateField(verbose_name=_("start date"))
+    end_date = models.DateField(
+        verbose_name=_("end date"), blank=True, null=True)
+    count = models.PositiveIntegerField(
+        verbose_name=_("number of occurrences"), default=0, editable=False)
+    next_date = models.DateField(
+        verbose_name=_("next occurrence"), editable=False, db_index=True)
+
+    objects = RecurringTransactionManager()
+
+    def __str__(self):
+        return "{other}: {amount}€ {frequency}".format(
+            other=self.other, amount=self.amount,
+            frequency=self.get_frequency_display())
+
+    def save(self, *args, **kwargs):
+        if self.owner_id is None:
+            self.owner_id = self.account.owner_id
+        if self.next_date is None:
+            self.next_date = self.get_occurrence(self.count)
+        super().save(*args, **kwargs)
+
+    def get_occurrence(self, n):
+        """Return the date of the n-th occurrence, starting from 0.
+        Monthly occurrences falling after the end of a month are moved to
+        its last day.
+        """
+        if self.frequency == self.WEEKLY:
+            return self.start_date + timedelta(weeks=n * self.interval)
+        months = n * self.interval
+        if self.frequency == self.YEARLY:
+            months *= 12
+        year, month = divmod(self.start_date.month - 1 + months, 12)
+        year += self.start_date.year
+        month += 1
+        return date(year, month,
+                    min(self.start_date.day, monthrange(year, month)[1]))
+
+    def materialize(self, until):
+        """Return the unsaved transactions of the occurrences due until the
+        given date, and advance `count` and `next_date` accordingly.
+        """
+        transactions = []
+        while self.next_date <= until and (self.end_date is None or
+                                           self.next_date <= self.end_date):
+            transactions.append(Transaction(
+                owner_id=self.owner_id, account_id=self.account_id,
+                box_id=self.box_id, other=self.other, amount=self.amount,
+                date=self.next_date,
+                short_description=self.short_description))
+            self.count += 1
+            self.next_date = self.get_occurrence(self.count)
+        return transactions
+
 
 class BoxTransfer(models.Model):
     """Represent a tranfer of money from a box to another."""
@@ -167,6 +479,8 @@ class BoxTransfer(models.Model):
     date = models.DateField(
         verbose_name=_("transaction date"), default=timezone.now)
 
+    objects = BoxTransferManager()
+
     def __str__(self):
         return "{date}: {frm} > {amount}€ > {to} ".format(
             date=self.date,
@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+"""Detect and fix the drift between the stored balances and the balances
+recomputed from the transactions.
+Every balance is recomputed by a single grouped query per table, whatever
+the number of accounts and boxes.
+"""
+from collections import namedtuple
+
+from django.db import connection
+
+from .cache import atomic, invalidate
+from .models import Account, Box, BoxTransfer, DailyBalance, Transaction
+
+
+Drift = namedtuple('Drift', ['pk', 'owner_id', 'name', 'stored', 'expected'])
+
+# The expected balance of an account is its opening amount plus its
+# transactions.
+_ACCOUNT_BALANCES = """
+    SELECT a.id, a.opening_amount + COALESCE(t.amount, 0) AS amount
+    FROM {account} a
+    LEFT JOIN (
+        SELECT account_id, SUM(amount) AS amount FROM {transaction}
+        GROUP BY account_id
+    ) t ON t.account_id = a.id
+""".format(account=Account._meta.db_table,
+           transaction=Transaction._meta.db_table)
+
+# The expected balance of a box is its opening amount plus its transactions
+# and the transfers it received, minus the transfers it made.
+_BOX_BALANCES = """
+    SELECT b.id, b.opening_amount + COALESCE(t.amount, 0)
+                 + COALESCE(c.amount, 0) - COALESCE(d.amount, 0) AS amount
+    FROM {box} b
+    LEFT JOIN (
+        SELECT box_id, SUM(amount) AS amount FROM {transaction}
+        GROUP BY box_id
+    ) t ON t.box_id = b.id
+    LEFT JOIN (
+        SELECT to_box_id, SUM(amount) AS amount FROM {transfer}
+        GROUP BY to_box_id
+    ) c ON c.to_box_id = b.id
+    LEFT JOIN (
+        SELECT from_box_id, SUM(amount) AS amount FROM {transfer}
+        GROUP BY from_box_id
+    ) d ON d.from_box_id = b.id
+""".format(box=Box._meta.db_table, transaction=Transaction._meta.db_table,
+           transfer=BoxTransfer._meta.db_table)
+
+_EXPECTED = {
+    Account: _ACCOUNT_BALANCES,
+    Box: _BOX_BALANCES,
+}
+
+
+def find_drifts(model):
+    """Return the `Drift` of every object of `model` (`Account` or `Box`)
+    whose stored amount differs from its expected balance.
+    """
+    sql = """
+        SELECT o.id, o.owner_id, o.name, o.amount, e.amount
+        FROM {table} o
+        INNER JOIN ({expected}) e ON e.id = o.id
+        WHERE o.amount <> e.amount
+        ORDER BY o.id
+    """.format(table=model._meta.db_table, expected=_EXPECTED[model])
+    with connection.cursor() as cursor:
+        cursor.execute(sql)
+        return [Drift(*row) for row in cursor.fetchall()]
+
+
+def fix_drifts(model):
+    """Overwrite the drifting amounts of `model` (`Account` or `Box`) with
+    their expected balance in a single `UPDATE` and return the pks of the
+    fixed objects.
+    """
+    # The rows are locked before the expected balances are computed: a
+    # posting in progress is waited for and then counted, a later one waits
+    # and applies its amount on top of the fixed balance.
+    lock = "SELECT id FROM {table} ORDER BY id FOR UPDATE".format(
+        table=model._meta.db_table)
+    sql = """
+        UPDATE {table} o SET amount = e.amount
+        FROM ({expected}) e
+        WHERE e.id = o.id AND o.amount <> e.amount
+        RETURNING o.id, o.owner_id
+    """.format(table=model._meta.db_table, expected=_EXPECTED[model])
+    with atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(lock)
+            cursor.execute(sql)
+            rows = cursor.fetchall()
+        pks = [pk for pk, owner_id in rows]
+        if model is Account and pks:
+            DailyBalance.objects.rebuild(pks)
+    invalidate(*[owner_id for pk, owner_id in rows])
+    return pks
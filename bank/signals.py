@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .cache import invalidate
+from .models import (
+    Account, Box, BoxTransfer, JournalEntry, SeriesBucket, Transaction,
+)
+
+
+@receiver([post_save, post_delete], sender=Account)
+@receiver([post_save, post_delete], sender=Box)
+@receiver([post_save, post_delete], sender=Transaction)
+def invalidate_owner_cache(sender, instance, **kwargs):
+    invalidate(instance.owner_id)
+
+
+@receiver([post_save, post_delete], sender=BoxTransfer)
+def invalidate_box_transfer_cache(sender, instance, **kwargs):
+    invalidate(instance.from_box.owner_id, instance.to_box.owner_id)
+
+
+@receiver(post_delete, sender=Transaction)
+def delete_empty_entry(sender, instance, **kwargs):
+    # Legs deleted along with their account or box leave their entry
+    # behind, which goes with its last leg.
+    if instance.entry_id is not None:
+        JournalEntry.objects.filter(
+            pk=instance.entry_id, legs__isnull=True).delete()
+
+
+@receiver(post_delete, sender=Transaction)
+def revert_series_buckets(sender, instance, **kwargs):
+    # Transactions deleted along with their account or box never go
+    # through `Transaction.delete()`, the buckets are reverted here.
+    SeriesBucket.objects.add([instance], reverse=True)
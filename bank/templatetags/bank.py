@@ -0,0 +1,26 @@
+# -*- coding: utf-8 -*-
+from django.template import Library
+
+from bank.aggregates import get_totals
+from bank.models import Account, Transaction
+
+
+register = Library()
+
+
+@register.inclusion_tag('bank/inc/account_summary.html')
+def account_summary(user, count=5):
+    """Render the accounts of the user with their amounts, followed by the
+    last transactions.
+    - `count`: the number of transactions to display (default: 5)
+    """
+    if not user.is_authenticated():
+        return {'accounts': [], 'transactions': []}
+    return {
+        'accounts': Account.objects.filter(owner_id=user.pk).order_by(
+            'name').only('name', 'amount'),
+        'total': get_totals(user.pk)['total'],
+        'transactions': Transaction.objects.filter(
+            owner_id=user.pk).order_by('-date', '-id').only(
+                'date', 'amount', 'other')[:count],
+    }
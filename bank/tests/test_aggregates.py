@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase
+
+from ..aggregates import get_totals
+from ..cache import atomic, get_version, invalidate
+from ..models import Account, Box, Transaction
+
+
+class TotalsTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.owner = User.objects.create_user('test_user')
+        self.account = Account.objects.create(
+            owner=self.owner, name="real", amount=100)
+        Account.objects.create(
+            owner=self.owner, name="virtual", amount=20, is_virtual=True)
+        self.box = Box.objects.create(
+            owner=self.owner, name="Flow Box", amount=120)
+
+    def test_totals(self):
+        totals = get_totals(self.owner.pk)
+        self.assertEqual(totals['total'], Decimal('120.00'))
+        self.assertEqual(totals['real'], Decimal('100.00'))
+        self.assertEqual(totals['virtual'], Decimal('20.00'))
+        self.assertEqual(totals['boxes'], {self.box.pk: Decimal('120.00')})
+
+    def test_no_account(self):
+        other = User.objects.create_user('other_user')
+        self.assertIsNone(get_totals(other.pk)['total'])
+
+    def test_cached(self):
+        get_totals(self.owner.pk)
+        with self.assertNumQueries(0):
+            get_totals(self.owner.pk)
+
+    def test_invalidated_by_save(self):
+        get_totals(self.owner.pk)
+        self.account.amount = 200
+        self.account.save()
+        self.assertEqual(get_totals(self.owner.pk)['total'],
+                         Decimal('220.00'))
+
+    def test_invalidated_by_post(self):
+        get_totals(self.owner.pk)
+        Transaction.objects.post(box=self.box, amount=10,
+                                 from_account=self.account, to_other="shop")
+        totals = get_totals(self.owner.pk)
+        self.assertEqual(totals['total'], Decimal('110.00'))
+        self.assertEqual(totals['boxes'], {self.box.pk: Decimal('110.00')})
+
+    def test_invalidated_after_commit(self):
+        get_totals(self.owner.pk)
+        with atomic():
+            with atomic():
+                invalidate(self.owner.pk)
+            # What a concurrent reader would cache before the commit.
+            version = get_version(self.owner.pk)
+        self.assertNotEqual(get_version(self.owner.pk), version)
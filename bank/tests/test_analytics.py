@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+from datetime import date
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase
+
+from .. import analytics
+from ..models import Account, Box, SeriesBucket, Transaction
+
+
+class AnalyticsTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.owner = User.objects.create_user('test_user')
+        self.account = Account.objects.create(
+            owner=self.owner, name="test_account", amount=100)
+        self.box = Box.objects.create(
+            owner=self.owner, name="Flow Box", amount=100)
+        self.box2 = Box.objects.create(
+            owner=self.owner, name="box2", amount=0)
+        for day, amount, box in [(date(2014, 12, 30), 10, self.box),
+                                 (date(2015, 1, 2), -5, self.box),
+                                 (date(2015, 1, 6), 20, self.box2),
+                                 (date(2015, 2, 1), Decimal('-15.01'),
+                                  self.box2),
+                                 (date(2016, 1, 1), 3, self.box)]:
+            Transaction.objects.create(account=self.account, box=box,
+                                       other="other", amount=amount,
+                                       date=day)
+
+    def test_columns(self):
+        columns = analytics.Columns(self.owner.pk, since=date(2015, 1, 1),
+                                    until=date(2015, 12, 31))
+        self.assertEqual(len(columns), 3)
+        self.assertEqual(columns.cents.tolist(), [-500, 2000, -1501])
+
+    def test_same_series_as_managers(self):
+        self.assertEqual(analytics.weekly_balances(self.owner.pk),
+                         Transaction.objects.weekly_balances(self.owner.pk))
+        self.assertEqual(analytics.monthly_sums(self.owner.pk),
+                         Transaction.objects.monthly_sums(self.owner.pk))
+
+    def test_bucket_series(self):
+        self.assertEqual(
+            analytics.bucket_series(self.owner.pk, SeriesBucket.WEEK),
+            analytics.weekly_balances(self.owner.pk))
+        self.assertEqual(
+            analytics.bucket_series(self.owner.pk, SeriesBucket.MONTH),
+            analytics.monthly_sums(self.owner.pk))
+        weeks = analytics.weekly_balances(self.owner.pk)
+        self.assertEqual(
+            analytics.bucket_series(self.owner.pk, SeriesBucket.WEEK,
+                                    since=weeks[1][0]),
+            weeks[1:])
+
+    def test_box_breakdown(self):
+        self.assertEqual(analytics.box_breakdown(self.owner.pk), {
+            self.box.pk: (Decimal('13.00'), Decimal('5.00')),
+            self.box2.pk: (Decimal('20.00'), Decimal('15.01')),
+        })
+
+    def test_rolling_monthly_average(self):
+        averages = analytics.rolling_monthly_average(self.owner.pk, 2)
+        self.assertEqual(averages[:3], [
+            (date(2015, 1, 1), Decimal('12.50')),
+            (date(2015, 2, 1), Decimal('0.00')),
+            (date(2015, 3, 1), Decimal('-7.50')),
+        ])
+        self.assertEqual(averages[-1], (date(2016, 1, 1), Decimal('1.50')))
+
+    def test_year_over_year(self):
+        self.assertEqual(analytics.year_over_year(self.owner.pk)[-1],
+                         (date(2016, 1, 1), Decimal('3.00'),
+                          Decimal('15.00')))
+
+    def test_empty(self):
+        other = User.objects.create_user('other_user')
+        self.assertEqual(analytics.weekly_balances(other.pk), [])
+        self.assertEqual(analytics.rolling_monthly_average(other.pk), [])
+        self.assertEqual(analytics.year_over_year(other.pk), [])
@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+from datetime import date
+import json
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+
+from ..exporters import export_csv, export_json, iter_pages
+from ..models import Account, Box, Transaction
+
+
+class ExportTestCase(TestCase):
+
+    def setUp(self):
+        owner = User.objects.create_user('test_user')
+        account = Account.objects.create(
+            owner=owner, name="test_account", amount=0)
+        box = Box.objects.create(owner=owner, name="Flow Box", amount=0)
+        for day in range(1, 6):
+            Transaction.credits.create(
+                account=account, box=box, other="Other, Inc.", amount=day,
+                date=date(2015, 1, day))
+        self.queryset = Transaction.objects.select_related('account', 'box')
+
+    def test_iter_pages(self):
+        pages = list(iter_pages(self.queryset, chunk_size=2))
+        self.assertEqual([len(page) for page in pages], [2, 2, 1])
+        self.assertEqual([t.date.day for page in pages for t in page],
+                         [5, 4, 3, 2, 1])
+
+    def test_export_csv(self):
+        lines = ''.join(
+            export_csv(iter_pages(self.queryset, chunk_size=2))).splitlines()
+        self.assertEqual(len(lines), 6)
+        self.assertEqual(lines[0],
+                         'date,account,box,amount,other,short_description')
+        self.assertEqual(
+            lines[1], '2015-01-05,test_account,Flow Box,5.00,"Other, Inc.",')
+
+    def test_export_json(self):
+        data = json.loads(''.join(
+            export_json(iter_pages(self.queryset, chunk_size=2))))
+        self.assertEqual(len(data), 5)
+        self.assertEqual(data[-1]['date'], '2015-01-01')
+        self.assertEqual(data[-1]['amount'], '1.00')
+
+    def test_export_empty(self):
+        pages = iter_pages(Transaction.objects.none())
+        self.assertEqual(json.loads(''.join(export_json(pages))), [])
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase
+
+from ..forecasting import Forecast, box_forecasts
+from ..models import Account, Box, BoxTransfer, Transaction
+
+
+class BoxForecastTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.today = date(2015, 3, 31)
+        self.owner = User.objects.create_user('test_user')
+        self.account = Account.objects.create(
+            owner=self.owner, name="account", amount=0)
+        self.flow_box = Box.objects.create(
+            owner=self.owner, name="Flow Box", amount=0)
+        self.savings = Box.objects.create(
+            owner=self.owner, name="Savings", amount=0, value=200)
+        self.holidays = Box.objects.create(
+            owner=self.owner, name="Holidays", amount=0,
+            parent_box=self.savings)
+
+    def days(self):
+        return [self.today - timedelta(days=i) for i in range(10)]
+
+    def forecasts(self):
+        return box_forecasts(self.owner.pk, today=self.today, window=10)
+
+    def test_fill_date(self):
+        for day in self.days():
+            Transaction.credits.create(account=self.account,
+                                       box=self.savings, other="other",
+                                       amount=10, date=day)
+        forecasts = self.forecasts()
+        self.assertEqual(forecasts[self.savings.pk],
+                         Forecast(Decimal('10.00'), date(2015, 4, 10)))
+        self.assertEqual(forecasts[self.flow_box.pk],
+                         Forecast(Decimal('0.00'), None))
+
+    def test_transfers_and_subboxes(self):
+        for day in self.days():
+            BoxTransfer.objects.transfer(self.flow_box,
+                                         [(self.holidays, 10)], date=day)
+        forecasts = self.forecasts()
+        self.assertEqual(forecasts[self.flow_box.pk].rate,
+                         Decimal('-10.00'))
+        self.assertEqual(forecasts[self.holidays.pk],
+                         Forecast(Decimal('10.00'), None))
+        self.assertEqual(forecasts[self.savings.pk],
+                         Forecast(Decimal('10.00'), date(2015, 4, 10)))
+
+    def test_already_full_or_emptying(self):
+        Transaction.debits.create(account=self.account, box=self.savings,
+                                  other="other", amount=10, date=self.today)
+        self.assertIsNone(self.forecasts()[self.savings.pk].fill_date)
+        Box.objects.filter(pk=self.savings.pk).update(amount=300)
+        cache.clear()
+        self.assertEqual(self.forecasts()[self.savings.pk].fill_date,
+                         self.today)
+
+    def test_cache(self):
+        self.forecasts()
+        with self.assertNumQueries(0):
+            self.forecasts()
+        Transaction.credits.create(account=self.account, box=self.savings,
+                                   other="other", amount=10, date=self.today)
+        self.assertEqual(self.forecasts()[self.savings.pk].rate,
+                         Decimal('0.55'))
@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase
+
+from ..choices import get_choices
+from ..forms import (
+    BoxMultiTransferForm, BoxTransferForm, TransactionCreateForm,
+    TransactionFilterForm,
+)
+from ..models import Account, Box
+
+
+class ChoicesTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.owner = User.objects.create_user('test_user')
+        self.account = Account.objects.create(
+            owner=self.owner, name="account", amount=100)
+        self.flow_box = Box.objects.create(
+            owner=self.owner, name="Flow Box", amount=100)
+        self.box = Box.objects.create(owner=self.owner, name="box", amount=0)
+        other = User.objects.create_user('other_user')
+        self.other_box = Box.objects.create(owner=other, name="other box",
+                                            amount=0)
+
+    def test_cached(self):
+        get_choices(self.owner.pk)
+        with self.assertNumQueries(0):
+            form = TransactionCreateForm(self.owner.pk, data={
+                'from_account': self.account.pk, 'to_other': "shop",
+                'amount': 10, 'box': self.box.pk, 'date': '2015-01-10'})
+            self.assertTrue(form.is_valid())
+            form.as_p()
+        self.assertEqual(form.cleaned_data['from_account'], self.account)
+        self.assertEqual(form.cleaned_data['box'], self.box)
+        self.assertEqual(form.fields['box'].initial, self.flow_box)
+
+    def test_invalidated(self):
+        get_choices(self.owner.pk)
+        box = Box.objects.create(owner=self.owner, name="new box", amount=0)
+        self.assertIn(box, get_choices(self.owner.pk)['boxes'])
+
+    def test_owner_boxes_only(self):
+        form = BoxTransferForm(self.owner.pk, data={
+            'from_box': self.flow_box.pk, 'to_box': self.other_box.pk,
+            'amount': 10})
+        self.assertFalse(form.is_valid())
+        self.assertIn('to_box', form.errors)
+
+    def test_filter_and_multi_transfer_cached(self):
+        get_choices(self.owner.pk)
+        with self.assertNumQueries(0):
+            form = TransactionFilterForm(self.owner.pk, data={
+                'account': self.account.pk, 'box': self.box.pk})
+            self.assertTrue(form.is_valid())
+            form.as_p()
+            transfer_form = BoxMultiTransferForm(self.owner.pk, data={
+                'from_box': self.flow_box.pk, 'mode': 'amounts',
+                'to_box_{}'.format(self.box.pk): 10, 'date': '2015-01-10'})
+            self.assertTrue(transfer_form.is_valid())
+            transfer_form.as_p()
+        self.assertEqual(form.get_lookups()['account'], self.account)
+        self.assertEqual(transfer_form.fields['from_box'].initial,
+                         self.flow_box)
+        self.assertEqual(transfer_form.cleaned_data['legs'],
+                         [(self.box, 10)])
@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+from datetime import date
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.test import TestCase
+
+from ..importers import TransactionImporter, parse_csv, parse_ofx
+from ..models import Account, Box, DailyBalance, JournalEntry, Transaction
+
+
+CSV = """date,amount,other,short_description
+2015-01-10,-20.50,Shop,Groceries
+2015-01-12,1500,Employer,Wage
+2015-01-15,-30,Landlord,
+""".splitlines(True)
+
+OFX = """OFXHEADER:100
+<OFX>
+<BANKMSGSRSV1><STMTTRNRS><STMTRS><BANKTRANLIST>
+<STMTTRN>
+<TRNTYPE>DEBIT
+<DTPOSTED>20150110120000
+<TRNAMT>-20,50
+<NAME>Shop
+<MEMO>Groceries
+</STMTTRN>
+<STMTTRN>
+<TRNTYPE>CREDIT
+<DTPOSTED>20150112
+<TRNAMT>1500.00
+<NAME>Employer</NAME>
+</STMTTRN>
+</BANKTRANLIST></STMTRS></STMTTRNRS></BANKMSGSRSV1>
+</OFX>
+""".splitlines(True)
+
+
+class ParserTestCase(TestCase):
+
+    def test_parse_csv(self):
+        rows = list(parse_csv(CSV))
+        self.assertEqual(len(rows), 3)
+        self.assertEqual(rows[0], {
+            'line': 2, 'date': '2015-01-10', 'amount': '-20.50',
+            'other': "Shop", 'short_description': "Groceries",
+        })
+        self.assertEqual(rows[2]['short_description'], '')
+
+    def test_parse_ofx(self):
+        rows = list(parse_ofx(OFX))
+        self.assertEqual(rows, [
+            {'line': 4, 'date': '2015-01-10', 'amount': '-20.50',
+             'other': "Shop", 'short_description': "Groceries"},
+            {'line': 11, 'date': '2015-01-12', 'amount': '1500.00',
+             'other': "Employer", 'short_description': ''},
+        ])
+
+
+class TransactionImporterTestCase(TestCase):
+
+    def setUp(self):
+        owner = User.objects.create_user('test_user')
+        self.account = Account.objects.create(
+            owner=owner, name="test_account", amount=100)
+        self.box = Box.objects.create(owner=owner, name="Flow Box", amount=0)
+        self.importer = TransactionImporter(self.account, self.box,
+                                            chunk_size=2)
+
+    def test_run(self):
+        self.assertEqual(self.importer.run(parse_csv(CSV)), 3)
+        self.assertEqual(JournalEntry.objects.count(), 3)
+        self.assertFalse(Transaction.objects.filter(entry=None).exists())
+        self.account.refresh_from_db()
+        self.box.refresh_from_db()
+        self.assertEqual(self.account.amount, Decimal('1549.50'))
+        self.assertEqual(self.box.amount, Decimal('1449.50'))
+        self.assertEqual(Transaction.debits.count(), 2)
+        self.assertEqual(Transaction.credits.get().other, "Employer")
+        self.assertEqual(
+            DailyBalance.objects.balance_at(self.account.pk,
+                                            date(2015, 1, 11)),
+            Decimal('79.50'))
+
+    def test_invalid_rows(self):
+        rows = list(parse_csv(CSV))
+        rows[0]['amount'] = 'foo'
+        rows[2]['other'] = ''
+        with self.assertRaises(ValidationError) as cm:
+            self.importer.run(rows)
+        self.assertEqual(len(cm.exception.messages), 2)
+        self.assertFalse(Transaction.objects.exists())
+        self.account.refresh_from_db()
+        self.assertEqual(self.account.amount, Decimal('100.00'))
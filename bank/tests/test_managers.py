@@ -0,0 +1,531 @@
+# -*- coding: utf-8 -*-
+from datetime import date
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+
+from ..models import (
+    Account, Box, BoxTransfer, Counterparty,
+    DailyBalance, JournalEntry, RecurringTransaction, SeriesBucket,
+    Transaction,
+)
+
+
+class TransactionReportingTestCase(TestCase):
+
+    def setUp(self):
+        self.owner = User.objects.create_user('test_user')
+        self.account = Account.objects.create(
+            owner=self.owner, name="test_account", amount=100)
+        self.box = Box.objects.create(
+            owner=self.owner, name="Flow Box", amount=100)
+        for day, amount in [(date(2014, 12, 30), 10),
+                            (date(2015, 1, 2), -5),
+                            (date(2015, 1, 6), 20),
+                            (date(2015, 2, 1), -15)]:
+            Transaction.objects.create(account=self.account, box=self.box,
+                                       other="other", amount=amount,
+                                       date=day)
+
+    def test_weekly_balances(self):
+        weeks = Transaction.objects.weekly_balances(self.owner.pk)
+        self.assertEqual(weeks, [
+            (date(2014, 12, 29), Decimal('95.00')),
+            (date(2015, 1, 5), Decimal('115.00')),
+            (date(2015, 1, 26), Decimal('100.00')),
+        ])
+        self.assertEqual([format(w, '%W') for w, b in weeks],
+                         ['52', '01', '04'])
+
+    def test_monthly_sums(self):
+        months = Transaction.objects.monthly_sums(self.owner.pk)
+        self.assertEqual(months, [
+            (date(2014, 12, 1), Decimal('10.00')),
+            (date(2015, 1, 1), Decimal('15.00')),
+            (date(2015, 2, 1), Decimal('-15.00')),
+        ])
+
+    def test_other_owner(self):
+        other = User.objects.create_user('other_user')
+        self.assertEqual(Transaction.objects.weekly_balances(other.pk), [])
+        self.assertEqual(Transaction.objects.monthly_sums(other.pk), [])
+
+
+class DailyBalanceTestCase(TestCase):
+
+    def setUp(self):
+        owner = User.objects.create_user('test_user')
+        self.account = Account.objects.create(
+            owner=owner, name="test_account", amount=100)
+        self.box = Box.objects.create(owner=owner, name="Flow Box", amount=0)
+
+    def credit(self, amount, day):
+        return Transaction.credits.create(
+            account=self.account, box=self.box, other="other",
+            amount=amount, date=day)
+
+    def debit(self, amount, day):
+        return Transaction.debits.create(
+            account=self.account, box=self.box, other="other",
+            amount=amount, date=day)
+
+    def snapshots(self):
+        return list(DailyBalance.objects.filter(
+            account=self.account).order_by('date').values_list(
+                'date', 'delta', 'amount'))
+
+    def test_post(self):
+        self.credit(50, date(2015, 1, 10))
+        self.debit(20, date(2015, 1, 5))
+        self.credit(5, date(2015, 1, 10))
+        self.debit(15, date(2015, 1, 20))
+        self.assertEqual(self.snapshots(), [
+            (date(2015, 1, 5), Decimal('-20.00'), Decimal('80.00')),
+            (date(2015, 1, 10), Decimal('55.00'), Decimal('135.00')),
+            (date(2015, 1, 20), Decimal('-15.00'), Decimal('120.00')),
+        ])
+
+    def test_balance_at(self):
+        self.credit(50, date(2015, 1, 10))
+        self.debit(20, date(2015, 1, 20))
+        balance_at = DailyBalance.objects.balance_at
+        self.assertEqual(balance_at(self.account.pk, date(2015, 1, 1)),
+                         Decimal('100.00'))
+        self.assertEqual(balance_at(self.account.pk, date(2015, 1, 15)),
+                         Decimal('150.00'))
+        self.assertEqual(balance_at(self.account.pk, date(2015, 2, 1)),
+                         Decimal('130.00'))
+
+    def test_update_date(self):
+        credit = self.credit(50, date(2015, 1, 10))
+        self.debit(20, date(2015, 1, 20))
+        credit.date = date(2015, 1, 25)
+        credit.save()
+        self.assertEqual(self.snapshots(), [
+            (date(2015, 1, 10), Decimal('0.00'), Decimal('100.00')),
+            (date(2015, 1, 20), Decimal('-20.00'), Decimal('80.00')),
+            (date(2015, 1, 25), Decimal('50.00'), Decimal('130.00')),
+        ])
+
+    def test_delete(self):
+        credit = self.credit(50, date(2015, 1, 10))
+        self.debit(20, date(2015, 1, 20))
+        credit.delete()
+        self.account.refresh_from_db()
+        self.assertEqual(self.account.amount, Decimal('80.00'))
+        self.assertEqual(
+            DailyBalance.objects.balance_at(self.account.pk,
+                                            date(2015, 1, 15)),
+            Decimal('100.00'))
+
+    def test_rebuild(self):
+        self.credit(50, date(2015, 1, 10))
+        self.debit(20, date(2015, 1, 5))
+        self.debit(15, date(2015, 1, 20))
+        expected = self.snapshots()
+        DailyBalance.objects.all().delete()
+        DailyBalance.objects.rebuild()
+        self.assertEqual(self.snapshots(), expected)
+
+
+class TransactionPostTestCase(TestCase):
+
+    def setUp(self):
+        self.owner = User.objects.create_user('test_user')
+        self.account1 = Account.objects.create(
+            owner=self.owner, name="account1", amount=100)
+        self.account2 = Account.objects.create(
+            owner=self.owner, name="account2", amount=50)
+        self.box = Box.objects.create(
+            owner=self.owner, name="Flow Box", amount=150)
+
+    def assertAmount(self, obj, amount):
+        obj.refresh_from_db()
+        self.assertEqual(obj.amount, Decimal(amount))
+
+    def test_transfer(self):
+        Transaction.objects.post(box=self.box, amount=Decimal('30.50'),
+                                 from_account=self.account1,
+                                 to_account=self.account2,
+                                 date=date(2015, 1, 10))
+        self.assertAmount(self.account1, '69.50')
+        self.assertAmount(self.account2, '80.50')
+        self.assertAmount(self.box, '150.00')
+        self.assertEqual(
+            list(Transaction.objects.order_by('id').values_list(
+                'account', 'other', 'amount', 'owner')),
+            [(self.account1.pk, "account2", Decimal('-30.50'),
+              self.owner.pk),
+             (self.account2.pk, "account1", Decimal('30.50'),
+              self.owner.pk)])
+
+    def test_debit(self):
+        Transaction.objects.post(box=self.box, amount=Decimal('20'),
+                                 from_account=self.account1,
+                                 to_other="shop", date=date(2015, 1, 10))
+        self.assertAmount(self.account1, '80.00')
+        self.assertAmount(self.account2, '50.00')
+        self.assertAmount(self.box, '130.00')
+        self.assertEqual(
+            DailyBalance.objects.balance_at(self.account1.pk,
+                                            date(2015, 1, 9)),
+            Decimal('100.00'))
+
+
+class LedgerTestCase(TestCase):
+
+    def setUp(self):
+        self.owner = User.objects.create_user('test_user')
+        self.account1 = Account.objects.create(
+            owner=self.owner, name="account1", amount=100)
+        self.account2 = Account.objects.create(
+            owner=self.owner, name="account2", amount=50)
+        self.box = Box.objects.create(
+            owner=self.owner, name="Flow Box", amount=150)
+
+    def test_journal_entry(self):
+        legs = Transaction.objects.post(
+            box=self.box, amount=Decimal('30.50'), from_account=self.account1,
+            to_account=self.account2, date=date(2015, 1, 10),
+            short_description="savings")
+        entry = JournalEntry.objects.get()
+        self.assertEqual(entry.date, date(2015, 1, 10))
+        self.assertEqual(entry.short_description, "savings")
+        self.assertEqual(sorted(entry.legs.values_list('pk', flat=True)),
+                         sorted(leg.pk for leg in legs))
+        self.assertEqual(sum(leg.amount for leg in entry.legs.all()), 0)
+
+    def test_single_legs(self):
+        credit = Transaction.credits.create(
+            account=self.account1, box=self.box, other="employer", amount=10,
+            date=date(2015, 1, 10), short_description="wage")
+        debit = Transaction.debits.create(
+            account=self.account1, box=self.box, other="shop", amount=5)
+        self.assertNotEqual(credit.entry_id, debit.entry_id)
+        self.assertEqual(
+            list(JournalEntry.objects.filter(pk=credit.entry_id).values_list(
+                'owner_id', 'date', 'short_description')),
+            [(self.owner.pk, date(2015, 1, 10), "wage")])
+        self.assertEqual(list(debit.entry.legs.all()), [debit])
+
+    def test_delete_leg(self):
+        legs = Transaction.objects.post(
+            box=self.box, amount=30, from_account=self.account1,
+            to_account=self.account2, date=date(2015, 1, 10))
+        legs[0].delete()
+        self.assertFalse(Transaction.objects.exists())
+        self.assertFalse(JournalEntry.objects.exists())
+        self.assertEqual(
+            list(Account.objects.order_by('pk').values_list(
+                'amount', flat=True)),
+            [Decimal('100.00'), Decimal('50.00')])
+
+    def test_delete_account(self):
+        Transaction.credits.create(
+            account=self.account2, box=self.box, other="employer", amount=10)
+        debit = Transaction.debits.create(
+            account=self.account1, box=self.box, other="shop", amount=5)
+        self.account2.delete()
+        self.assertEqual(list(JournalEntry.objects.all()), [debit.entry])
+
+
+class BoxTreeTestCase(TestCase):
+
+    def setUp(self):
+        self.owner = User.objects.create_user('test_user')
+        flow = Box.objects.create(owner=self.owner, name="Flow Box",
+                                  amount=10)
+        bills = Box.objects.create(owner=self.owner, name="Bills",
+                                   amount=20, value=100, parent_box=flow)
+        Box.objects.create(owner=self.owner, name="Rent", amount=30,
+                           parent_box=bills)
+        Box.objects.create(owner=self.owner, name="Extra", amount=5,
+                           value=10)
+
+    def test_tree(self):
+        with self.assertNumQueries(1):
+            tree = Box.objects.tree(self.owner.pk)
+        self.assertEqual(
+            [(b.name, b.depth, b.parent_box_name, b.subtree_amount)
+             for b in tree],
+            [("Extra", 0, None, Decimal('5.00')),
+             ("Flow Box", 0, None, Decimal('60.00')),
+             ("Bills", 1, "Flow Box", Decimal('50.00')),
+             ("Rent", 2, "Bills", Decimal('30.00'))])
+        self.assertEqual([b.fill_rate for b in tree],
+                         [Decimal('0.5'), None, Decimal('0.5'), None])
+
+    def test_other_owner(self):
+        other = User.objects.create_user('other_user')
+        self.assertEqual(Box.objects.tree(other.pk), [])
+
+
+class BoxTransferTestCase(TestCase):
+
+    def setUp(self):
+        owner = User.objects.create_user('test_user')
+        self.flow = Box.objects.create(owner=owner, name="Flow Box",
+                                       amount=1000)
+        self.bills = Box.objects.create(owner=owner, name="Bills", amount=0)
+        self.extra = Box.objects.create(owner=owner, name="Extra", amount=5)
+
+    def assertAmount(self, box, amount):
+        box.refresh_from_db()
+        self.assertEqual(box.amount, Decimal(amount))
+
+    def test_transfer(self):
+        # savepoint, insert, lock, update, release
+        with self.assertNumQueries(5):
+            BoxTransfer.objects.transfer(
+                self.flow, [(self.bills, Decimal('600')),
+                            (self.extra, Decimal('150.50'))],
+                date=date(2015, 1, 10))
+        self.assertAmount(self.flow, '249.50')
+        self.assertAmount(self.bills, '600.00')
+        self.assertAmount(self.extra, '155.50')
+        self.assertEqual(BoxTransfer.objects.count(), 2)
+
+    def test_split(self):
+        legs = BoxTransfer.objects.split(
+            Decimal('100'), [(self.bills, 33), (self.extra, Decimal('33.5'))])
+        self.assertEqual(legs, [(self.bills, Decimal('33.00')),
+                                (self.extra, Decimal('33.50'))])
+        legs = BoxTransfer.objects.split(
+            Decimal('10'), [(self.bills, Decimal('33.33')),
+                            (self.extra, Decimal('33.33')),
+                            (self.flow, Decimal('33.34'))])
+        self.assertEqual([amount for box, amount in legs],
+                         [Decimal('3.33'), Decimal('3.33'), Decimal('3.34')])
+
+
+class RecurringTransactionTestCase(TestCase):
+
+    def setUp(self):
+        owner = User.objects.create_user('test_user')
+        self.account = Account.objects.create(
+            owner=owner, name="test_account", amount=0)
+        self.box = Box.objects.create(owner=owner, name="Flow Box", amount=0)
+        self.rent = RecurringTransaction.objects.create(
+            account=self.account, box=self.box, other="Landlord",
+            amount=-500, frequency=RecurringTransaction.MONTHLY,
+            start_date=date(2015, 1, 31))
+        self.wage = RecurringTransaction.objects.create(
+            account=self.account, box=self.box, other="Employer",
+            amount=1500, frequency=RecurringTransaction.MONTHLY,
+            start_date=date(2015, 1, 1), end_date=date(2015, 2, 15))
+
+    def test_get_occurrence(self):
+        self.assertEqual(
+            [self.rent.get_occurrence(n) for n in range(4)],
+            [date(2015, 1, 31), date(2015, 2, 28), date(2015, 3, 31),
+             date(2015, 4, 30)])
+        self.rent.frequency = RecurringTransaction.WEEKLY
+        self.rent.interval = 2
+        self.assertEqual(self.rent.get_occurrence(1), date(2015, 2, 14))
+        self.rent.frequency = RecurringTransaction.YEARLY
+        self.rent.interval = 1
+        self.assertEqual(self.rent.get_occurrence(1), date(2016, 1, 31))
+
+    def test_materialize(self):
+        count = RecurringTransaction.objects.materialize(
+            date(2015, 3, 31), batch_size=1)
+        self.assertEqual(count, 5)
+        self.assertEqual(JournalEntry.objects.count(), 5)
+        self.assertFalse(Transaction.objects.filter(entry=None).exists())
+        self.assertEqual(
+            list(Transaction.objects.order_by('date', 'other').values_list(
+                'date', 'amount')),
+            [(date(2015, 1, 1), Decimal('1500.00')),
+             (date(2015, 1, 31), Decimal('-500.00')),
+             (date(2015, 2, 1), Decimal('1500.00')),
+             (date(2015, 2, 28), Decimal('-500.00')),
+             (date(2015, 3, 31), Decimal('-500.00'))])
+        self.account.refresh_from_db()
+        self.assertEqual(self.account.amount, Decimal('1500.00'))
+        self.rent.refresh_from_db()
+        self.assertEqual(self.rent.count, 3)
+        self.assertEqual(self.rent.next_date, date(2015, 4, 30))
+
+    def test_materialize_daily_balances(self):
+        for amount, day in [(100, date(2015, 2, 1)), (10, date(2015, 3, 15))]:
+            Transaction.credits.create(account=self.account, box=self.box,
+                                       other="other", amount=amount,
+                                       date=day)
+        RecurringTransaction.objects.materialize(date(2015, 3, 31))
+        snapshots = DailyBalance.objects.order_by('date').values_list(
+            'date', 'delta', 'amount')
+        posted = list(snapshots)
+        DailyBalance.objects.rebuild()
+        self.assertEqual(posted, list(snapshots))
+        self.assertEqual(posted[2], (date(2015, 2, 1), Decimal('1600.00'),
+                                     Decimal('2600.00')))
+
+    def test_materialize_is_idempotent(self):
+        RecurringTransaction.objects.materialize(date(2015, 3, 31))
+        count = RecurringTransaction.objects.materialize(date(2015, 3, 31))
+        self.assertEqual(count, 0)
+        self.assertEqual(Transaction.objects.count(), 5)
+
+
+class TransactionSearchTestCase(TestCase):
+
+    def setUp(self):
+        owner = User.objects.create_user('test_user')
+        account = Account.objects.create(owner=owner, name="account",
+                                         amount=0)
+        box = Box.objects.create(owner=owner, name="Flow Box", amount=0)
+        for other, description in [("Groceries Market", ""),
+                                   ("Landlord", "rent 100%"),
+                                   ("Electricity", "bill")]:
+            Transaction.debits.create(account=account, box=box, other=other,
+                                      amount=10,
+                                      short_description=description)
+
+    def search(self, text):
+        return sorted(Transaction.objects.search(text).values_list(
+            'other', flat=True))
+
+    def test_substring(self):
+        self.assertEqual(self.search("market"), ["Groceries Market"])
+        self.assertEqual(self.search("BILL"), ["Electricity"])
+
+    def test_wildcards_are_escaped(self):
+        self.assertEqual(self.search("100%"), ["Landlord"])
+        self.assertEqual(self.search("%"), ["Landlord"])
+
+    def test_fuzzy(self):
+        self.assertEqual(self.search("Landlors"), ["Landlord"])
+
+
+class CounterpartyTestCase(TestCase):
+
+    def setUp(self):
+        self.owner = User.objects.create_user('test_user')
+        self.account1 = Account.objects.create(
+            owner=self.owner, name="account1", amount=100)
+        self.account2 = Account.objects.create(
+            owner=self.owner, name="account2", amount=0)
+        self.box = Box.objects.create(
+            owner=self.owner, name="Flow Box", amount=100)
+
+    def post(self, day, **kwargs):
+        Transaction.objects.post(box=self.box, amount=Decimal(10),
+                                 date=date(2015, 1, day), **kwargs)
+
+    def test_record(self):
+        self.post(1, from_account=self.account1, to_other="Shop")
+        self.post(3, from_other="Employer", to_account=self.account1)
+        self.post(2, from_account=self.account1, to_other="Shop")
+        self.post(4, from_account=self.account1, to_account=self.account2)
+        self.assertEqual(
+            list(Counterparty.objects.order_by('name').values_list(
+                'name', 'usage_count', 'last_used')),
+            [("Employer", 1, date(2015, 1, 3)),
+             ("Shop", 2, date(2015, 1, 2))])
+
+    def test_suggest(self):
+        for day, name in enumerate(["Shop", "Shoes", "Shoes", "Bank"], 1):
+            self.post(day, from_account=self.account1, to_other=name)
+        self.assertEqual(Counterparty.objects.suggest(self.owner.pk, "sho"),
+                         ["Shoes", "Shop"])
+        self.assertEqual(
+            Counterparty.objects.suggest(self.owner.pk, "sho", limit=1),
+            ["Shoes"])
+
+
+class TransactionFacetsTestCase(TestCase):
+
+    def test_facets(self):
+        owner = User.objects.create_user('test_user')
+        account1 = Account.objects.create(owner=owner, name="account1",
+                                          amount=0)
+        account2 = Account.objects.create(owner=owner, name="account2",
+                                          amount=0)
+        box = Box.objects.create(owner=owner, name="Flow Box", amount=0)
+        for account, day in [(account1, date(2015, 1, 5)),
+                             (account1, date(2015, 2, 5)),
+                             (account2, date(2015, 2, 6))]:
+            Transaction.credits.create(account=account, box=box,
+                                       other="other", amount=10, date=day)
+        with self.assertNumQueries(1):
+            facets = Transaction.objects.all().facets()
+        self.assertEqual(facets['account'], {account1.pk: 2, account2.pk: 1})
+        self.assertEqual(facets['box'], {box.pk: 3})
+        self.assertEqual(facets['month'], {date(2015, 1, 1): 1,
+                                           date(2015, 2, 1): 2})
+
+
+class SeriesBucketTestCase(TestCase):
+
+    def setUp(self):
+        self.owner = User.objects.create_user('test_user')
+        self.account = Account.objects.create(
+            owner=self.owner, name="test_account", amount=0)
+        self.box = Box.objects.create(owner=self.owner, name="Flow Box",
+                                      amount=0)
+
+    def credit(self, amount, day):
+        return Transaction.credits.create(
+            account=self.account, box=self.box, other="other",
+            amount=amount, date=day)
+
+    def buckets(self, period):
+        return SeriesBucket.objects.deltas(self.owner.pk, period)
+
+    def test_add(self):
+        # 2015-01-01 is in the first ISO week of 2015, which starts on
+        # 2014-12-29.
+        self.credit(10, date(2015, 1, 1))
+        self.credit(5, date(2014, 12, 30))
+        self.credit(-3, date(2015, 1, 5))
+        self.assertEqual(self.buckets(SeriesBucket.WEEK), [
+            (date(2014, 12, 29), Decimal('15.00')),
+            (date(2015, 1, 5), Decimal('-3.00')),
+        ])
+        self.assertEqual(self.buckets(SeriesBucket.MONTH), [
+            (date(2014, 12, 1), Decimal('5.00')),
+            (date(2015, 1, 1), Decimal('7.00')),
+        ])
+
+    def test_move_and_delete(self):
+        credit = self.credit(10, date(2015, 1, 1))
+        self.credit(5, date(2015, 2, 3))
+        credit.date = date(2015, 2, 4)
+        credit.save()
+        self.assertEqual(self.buckets(SeriesBucket.WEEK), [
+            (date(2015, 2, 2), Decimal('15.00')),
+        ])
+        credit.delete()
+        self.assertEqual(self.buckets(SeriesBucket.MONTH), [
+            (date(2015, 2, 1), Decimal('5.00')),
+        ])
+
+    def test_delete_account(self):
+        self.credit(10, date(2015, 1, 1))
+        other = Account.objects.create(owner=self.owner, name="other",
+                                       amount=0)
+        Transaction.credits.create(account=other, box=self.box,
+                                   other="other", amount=5,
+                                   date=date(2015, 1, 2))
+        self.account.delete()
+        self.assertEqual(self.buckets(SeriesBucket.WEEK), [
+            (date(2014, 12, 29), Decimal('5.00')),
+        ])
+        other.delete()
+        self.assertFalse(SeriesBucket.objects.exists())
+
+    def test_delete_owner(self):
+        self.credit(10, date(2015, 1, 1))
+        self.owner.delete()
+        self.assertFalse(SeriesBucket.objects.exists())
+
+    def test_rebuild(self):
+        self.credit(10, date(2015, 1, 1))
+        self.credit(5, date(2015, 2, 3))
+        expected = [self.buckets(period) for period in
+                    (SeriesBucket.WEEK, SeriesBucket.MONTH)]
+        SeriesBucket.objects.all().delete()
+        SeriesBucket.objects.rebuild([self.owner.pk])
+        self.assertEqual([self.buckets(period) for period in
+                          (SeriesBucket.WEEK, SeriesBucket.MONTH)], expected)
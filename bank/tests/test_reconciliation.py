@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+
+from ..models import Account, Box, BoxTransfer, Transaction
+from ..reconciliation import find_drifts, fix_drifts
+
+
+class ReconciliationTestCase(TestCase):
+
+    def setUp(self):
+        self.owner = User.objects.create_user('test_user')
+        self.account = Account.objects.create(
+            owner=self.owner, name="account", amount=100)
+        self.flow_box = Box.objects.create(
+            owner=self.owner, name="Flow Box", amount=0)
+        self.box = Box.objects.create(owner=self.owner, name="box", amount=0)
+        Transaction.objects.post(box=self.flow_box, amount=Decimal('30'),
+                                 from_other="employer",
+                                 to_account=self.account)
+        BoxTransfer.objects.transfer(self.flow_box, [(self.box, 10)])
+
+    def test_no_drift(self):
+        self.assertEqual(find_drifts(Account), [])
+        self.assertEqual(find_drifts(Box), [])
+
+    def test_find_drifts(self):
+        Account.objects.filter(pk=self.account.pk).update(amount=200)
+        Box.objects.filter(pk=self.box.pk).update(amount=5)
+        self.assertEqual(
+            [tuple(d) for d in find_drifts(Account)],
+            [(self.account.pk, self.owner.pk, "account", Decimal('200.00'),
+              Decimal('130.00'))])
+        self.assertEqual(
+            [(d.pk, d.stored, d.expected) for d in find_drifts(Box)],
+            [(self.box.pk, Decimal('5.00'), Decimal('10.00'))])
+
+    def test_fix_drifts(self):
+        Account.objects.filter(pk=self.account.pk).update(amount=200)
+        Box.objects.filter(pk=self.flow_box.pk).update(amount=0)
+        self.assertEqual(fix_drifts(Account), [self.account.pk])
+        self.assertEqual(fix_drifts(Box), [self.flow_box.pk])
+        self.account.refresh_from_db()
+        self.flow_box.refresh_from_db()
+        self.assertEqual(self.account.amount, Decimal('130.00'))
+        self.assertEqual(self.flow_box.amount, Decimal('20.00'))
+        self.assertEqual(find_drifts(Account), [])
+        self.assertEqual(find_drifts(Box), [])
+
+    def test_opening_amounts(self):
+        account = Account.objects.create(owner=self.owner, name="savings",
+                                         amount=500)
+        box = Box.objects.create(owner=self.owner, name="savings",
+                                 amount=500)
+        Transaction.credits.create(account=account, box=box, other="other",
+                                   amount=20)
+        BoxTransfer.objects.transfer(box, [(self.box, 5)])
+        self.assertEqual(find_drifts(Account), [])
+        self.assertEqual(find_drifts(Box), [])
+        self.assertEqual(fix_drifts(Box), [])
+        box.refresh_from_db()
+        self.assertEqual(box.amount, Decimal('515.00'))
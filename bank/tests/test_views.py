@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+from datetime import date
+import json
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.urlresolvers import reverse
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from ..models import Account, Box, Transaction
+from .utils import QueryCountMixin
+
+
+class ListViewsTestCase(QueryCountMixin, TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.owner = User.objects.create_user('test_user', password='pass')
+        self.client.login(username='test_user', password='pass')
+        self.flow_box = Box.objects.create(
+            owner=self.owner, name="Flow Box", amount=0)
+
+    def add_transactions(self, count=3):
+        start = Account.objects.count()
+        for i in range(start, start + count):
+            account = Account.objects.create(
+                owner=self.owner, name="account_{}".format(i), amount=0)
+            box = Box.objects.create(
+                owner=self.owner, name="box_{}".format(i), amount=0,
+                parent_box=self.flow_box)
+            Transaction.credits.create(account=account, box=box,
+                                       other="other", amount=10)
+
+    def get(self, name):
+        response = self.client.get(reverse(name))
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_transactions(self):
+        self.add_transactions()
+        self.assertConstantQueries(lambda: self.get('bank:transactions'),
+                                   self.add_transactions)
+
+    def test_accounts(self):
+        self.add_transactions()
+        self.assertConstantQueries(lambda: self.get('bank:accounts'),
+                                   self.add_transactions)
+
+    def test_boxes(self):
+        self.add_transactions()
+        self.assertConstantQueries(lambda: self.get('bank:boxes'),
+                                   self.add_transactions)
+
+    def test_search(self):
+        self.add_transactions()
+        self.assertConstantQueries(
+            lambda: self.client.get(reverse('bank:transactions_search'),
+                                    {'q': "other", 'min_amount': 5}),
+            self.add_transactions)
+        response = self.client.get(reverse('bank:transactions_search'),
+                                   {'q': "nothing like this"})
+        self.assertEqual(list(response.context['object_list']), [])
+
+    def test_filters(self):
+        self.add_transactions()
+        account = Account.objects.first()
+        response = self.client.get(reverse('bank:transactions'), {
+            'account': account.pk, 'sign': 'credits'})
+        self.assertEqual(
+            [t.account_id for t in response.context['object_list']],
+            [account.pk])
+        self.assertEqual(response.context['facets']['account'],
+                         [(account, 1)])
+        response = self.client.get(reverse('bank:transactions'),
+                                   {'sign': 'debits'})
+        self.assertEqual(list(response.context['object_list']), [])
+
+    def test_account_summary(self):
+        account = Account.objects.create(owner=self.owner, name="account",
+                                         amount=0)
+        Transaction.credits.create(account=account, box=self.flow_box,
+                                   other="first other", amount=10)
+        with CaptureQueriesContext(connection) as first:
+            self.assertContains(self.get('bank:accounts'), "first other")
+        with CaptureQueriesContext(connection) as second:
+            self.assertContains(self.get('bank:accounts'), "first other")
+        self.assertLess(len(second), len(first))
+        Transaction.credits.create(account=account, box=self.flow_box,
+                                   other="second other", amount=10)
+        self.assertContains(self.get('bank:accounts'), "second other")
+
+
+class ChartDataViewTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.owner = User.objects.create_user('test_user', password='pass')
+        self.client.login(username='test_user', password='pass')
+        self.account = Account.objects.create(
+            owner=self.owner, name="account", amount=0)
+        self.box = Box.objects.create(owner=self.owner, name="Flow Box",
+                                      amount=0)
+        for day in [date(2015, 1, 5), date(2015, 2, 10)]:
+            Transaction.credits.create(account=self.account, box=self.box,
+                                       other="other", amount=10, date=day)
+
+    def get(self, series, **kwargs):
+        return self.client.get(
+            reverse('bank:dashboard_data', kwargs={'series': series}),
+            kwargs.pop('data', {}), **kwargs)
+
+    def get_json(self, series, **kwargs):
+        response = self.get(series, **kwargs)
+        self.assertEqual(response.status_code, 200)
+        return json.loads(response.content.decode('utf-8'))
+
+    def test_series(self):
+        self.assertEqual(self.get_json('monthly'), {
+            'dates': ['2015-01-01', '2015-02-01'],
+            'labels': ['01', '02'],
+            'values': [10.0, 10.0],
+        })
+
+    def test_range(self):
+        data = self.get_json('weekly', data={'since': '2015-01-01',
+                                             'until': '2015-01-31'})
+        self.assertEqual(data['dates'], ['2015-01-05'])
+        # ISO week numbers: 2015-01-05 starts the second week of 2015.
+        self.assertEqual(data['labels'], ['02'])
+        self.assertEqual(data['values'], [10.0])
+        response = self.get('weekly', data={'since': '2015-02-01',
+                                            'until': '2015-01-01'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_conditional_get(self):
+        etag = self.get('weekly')['ETag']
+        response = self.get('weekly', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        Transaction.credits.create(account=self.account, box=self.box,
+                                   other="other", amount=10)
+        response = self.get('weekly', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
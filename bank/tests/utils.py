@@ -0,0 +1,22 @@
+# -*- coding: utf-8 -*-
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+class QueryCountMixin(object):
+    """Mixin for `TestCase` to check for N+1 query issues."""
+
+    def assertConstantQueries(self, func, add_rows):
+        """Assert `func` runs the same number of queries before and after
+        calling `add_rows`, which is expected to create more rows.
+        """
+        with CaptureQueriesContext(connection) as before:
+            func()
+        add_rows()
+        with CaptureQueriesContext(connection) as after:
+            func()
+        self.assertEqual(
+            len(before), len(after),
+            "{} queries before adding rows, {} after:\n{}".format(
+                len(before), len(after),
+                '\n'.join(q['sql'] for q in after.captured_queries)))
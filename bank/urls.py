@@ -8,6 +8,8 @@ urlpatterns = [
     url(r'^$', views.DashboardView.as_view(), name='index'),
 
     url(r'^dashboard/$', views.DashboardView.as_view(), name='dashboard'),
+    url(r'^dashboard/(?P<series>weekly|monthly)\.json$',
+        views.ChartDataView.as_view(), name='dashboard_data'),
 
     url(r'^accounts/$', views.AccountsView.as_view(), name='accounts'),
     url(r'^accounts/new/$', views.AccountCreateView.as_view(),
@@ -21,6 +23,8 @@ urlpatterns = [
 
     url(r'^boxes/$', views.BoxesView.as_view(), name='boxes'),
     url(r'^boxes/new/$', views.BoxCreateView.as_view(), name='boxes_new'),
+    url(r'^boxes/transfer/$', views.BoxMultiTransferView.as_view(),
+        name='boxes_transfer'),
     url(r'^boxes/(?P<pk>[0-9]+)/$', views.BoxUpdateView.as_view(),
         name='boxes_item'),
     url(r'^boxes/(?P<pk>[0-9]+)/delete/$', views.BoxDeleteView.as_view(),
@@ -30,6 +34,16 @@ urlpatterns = [
         name='transactions'),
     url(r'^transactions/new/$', views.TransactionCreateView.as_view(),
         name='transactions_new'),
+    url(r'^transactions/counterparties/$',
+        views.CounterpartyAutocompleteView.as_view(),
+        name='transactions_counterparties'),
+    url(r'^transactions/search/$', views.TransactionSearchView.as_view(),
+        name='transactions_search'),
+    url(r'^transactions/import/$', views.TransactionImportView.as_view(),
+        name='transactions_import'),
+    url(r'^transactions/export\.(?P<file_format>csv|json)$',
+        views.TransactionExportView.as_view(),
+        name='transactions_export'),
     url(r'^transactions/(?P<pk>[0-9]+)/$',
         views.TransactionUpdateView.as_view(),
         name='transactions_item'),
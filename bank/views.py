@@ -1,65 +1,89 @@
 # -*- coding: utf-8 -*-
-from datetime import datetime
-from itertools import groupby
+import codecs
 
+from django.contrib import messages
 from django.core.urlresolvers import reverse_lazy
-from django.db.models import Sum, F, Func
-from django.http import HttpResponseRedirect
-from django.views.generic.base import TemplateView
+from django.forms import ValidationError
+from django.http import (
+    HttpResponseRedirect, JsonResponse, StreamingHttpResponse,
+)
+from django.utils.decorators import method_decorator
+from django.utils.translation import ugettext as _
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
+from django.views.generic.base import TemplateView, View
 from django.views.generic.edit import (
     FormView, CreateView, UpdateView, DeleteView,
 )
 from django.views.generic.list import ListView
 
-from .forms import TransactionCreateForm, BoxTransferForm
-from .models import Account, Box, Transaction
-
+from ui.pagination import CursorPaginationMixin
 
-def _week_keyfunc(x):
-    dt = x.date
-    if format(dt, '%W') == '00':
-        dt = datetime(dt.year-1, 12, 31)
-    return format(dt, '%Y-%W')
+from . import analytics
+from .forms import (
+    ChartRangeForm, TransactionCreateForm, TransactionFilterForm,
+    TransactionImportForm, TransactionSearchForm, BoxTransferForm,
+    BoxMultiTransferForm,
+)
+from .aggregates import get_totals
+from .cache import get_version
+from .exporters import EXPORTERS, iter_pages
+from .forecasting import box_forecasts
+from .importers import PARSERS, TransactionImporter
+from .models import Account, Box, Counterparty, SeriesBucket, Transaction
 
 
 class DashboardView(TemplateView):
     template_name = 'bank/dashboard.html'
 
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
 
-        queryset = Account.objects.filter(owner_id=self.request.user.pk)
-        queryset = queryset.aggregate(total=Sum('amount'))
-        amount = total_amount = queryset['total']
-
-        transactions = Transaction.objects.filter(
-            account__owner_id=self.request.user.pk).order_by('-date')
-
-        by_weeks_keys = []
-        by_weeks_values = []
-        for k, v in groupby(transactions, _week_keyfunc):
-            by_weeks_keys.append(k.split('-')[1])
-            by_weeks_values.append(str(amount))
-            amount -= sum(x.amount for x in v)
-
-        by_months_keys = []
-        by_months_values = []
-        for k, v in groupby(transactions, lambda x: format(x.date, "%Y-%m")):
-            by_months_keys.append(k.split('-')[1])
-            by_months_values.append(str(sum(x.amount for x in v)))
-
-        graph_weekly = {
-            'keys': '[{}]'.format(','.join(by_weeks_keys[::-1])),
-            'values': '[{}]'.format(','.join(by_weeks_values[::-1])),
-        }
-
-        graph_monthly = {
-            'keys': '[{}]'.format(','.join(by_months_keys[::-1])),
-            'values': '[{}]'.format(','.join(by_months_values[::-1])),
-        }
-        context['graph_weekly'] = graph_weekly
-        context['graph_monthly'] = graph_monthly
-        return context
+def chart_etag(request, series):
+    """Return the ETag of a chart series, which changes with the data of the
+    user, i.e. with its cache version, and with the requested range.
+    """
+    return '{version}:{series}:{since}:{until}'.format(
+        version=get_version(request.user.pk), series=series,
+        since=request.GET.get('since', ''), until=request.GET.get('until', ''))
+
+
+class ChartDataView(View):
+    """Return the weekly balances or the monthly sums of the user as JSON,
+    optionally restricted to the `since` and `until` dates.
+    Clients must revalidate the data, which is only sent again when it has
+    changed.
+    """
+    series = {
+        'weekly': (SeriesBucket.WEEK,
+                   lambda day: '{:02d}'.format(day.isocalendar()[1])),
+        'monthly': (SeriesBucket.MONTH, lambda day: format(day, '%m')),
+    }
+
+    @method_decorator(cache_control(private=True, max_age=0))
+    @method_decorator(condition(etag_func=chart_etag))
+    def dispatch(self, *args, **kwargs):
+        return super().dispatch(*args, **kwargs)
+
+    def get(self, request, series):
+        form = ChartRangeForm(request.GET)
+        if not form.is_valid():
+            return JsonResponse({'errors': form.errors}, status=400)
+        since = form.cleaned_data['since']
+        until = form.cleaned_data['until']
+        period, label = self.series[series]
+        if since is not None:
+            since = SeriesBucket.get_starts(since)[
+                0 if period == SeriesBucket.WEEK else 1][1]
+        points = [
+            (day, value)
+            for day, value in analytics.bucket_series(request.user.pk,
+                                                      period, since)
+            if until is None or day <= until
+        ]
+        return JsonResponse({
+            'dates': [day.isoformat() for day, value in points],
+            'labels': [label(day) for day, value in points],
+            'values': [float(value) for day, value in points],
+        })
 
 
 class AccountsView(ListView):
@@ -67,12 +91,13 @@ class AccountsView(ListView):
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['total_amount'] = self.get_queryset().aggregate(
-            total=Sum('amount'))['total']
+        context['total_amount'] = get_totals(self.request.user.pk)['total']
         return context
 
     def get_queryset(self):
-        return self.model.objects.filter(owner_id=self.request.user.pk)
+        return self.model.objects.filter(
+            owner_id=self.request.user.pk).only(
+                'name', 'amount', 'iban', 'bic')
 
 
 class AccountCreateView(CreateView):
@@ -113,8 +138,31 @@ class BoxesView(FormView):
         return context
 
     def get_queryset(self):
-        return self.model.objects.filter(
-            owner_id=self.request.user.pk).order_by('parent_box', 'name')
+        boxes = self.model.objects.tree(self.request.user.pk)
+        forecasts = box_forecasts(self.request.user.pk)
+        for box in boxes:
+            box.forecast = forecasts.get(box.pk)
+        return boxes
+
+    def get_form_kwargs(self):
+        kwargs = super().get_form_kwargs()
+        kwargs['owner_id'] = self.request.user.pk
+        return kwargs
+
+    def form_valid(self, form):
+        form.save()
+        return HttpResponseRedirect(self.get_success_url())
+
+
+class BoxMultiTransferView(FormView):
+    form_class = BoxMultiTransferForm
+    success_url = reverse_lazy('bank:boxes')
+    template_name = 'bank/box_transfer.html'
+
+    def get_form_kwargs(self):
+        kwargs = super().get_form_kwargs()
+        kwargs['owner_id'] = self.request.user.pk
+        return kwargs
 
     def form_valid(self, form):
         form.save()
@@ -147,14 +195,51 @@ class BoxDeleteView(DeleteView):
     template_name = 'bank/box_delete.html'
 
 
-class TransactionsView(ListView):
+class TransactionsView(CursorPaginationMixin, ListView):
+    """List the transactions matching the filters of the query string,
+    along with their counts per account, box and month.
+    """
     model = Transaction
     paginate_by = 30
-    paginate_orphans = 10
+    paginate_count = False
+    ordering = ('-date', '-id')
+    form_class = TransactionFilterForm
+
+    def get(self, request, *args, **kwargs):
+        self.form = self.form_class(request.user.pk, request.GET)
+        return super().get(request, *args, **kwargs)
 
     def get_queryset(self):
-        return self.model.objects.filter(
-            account__owner_id=self.request.user.pk).order_by('-date')
+        return self.form.get_queryset().select_related(
+            'account', 'box').only(
+                'date', 'amount', 'other', 'short_description',
+                'account__name', 'box__name')
+
+    def get_facets(self):
+        counts = self.form.get_queryset().facets()
+        return {
+            'account': [
+                (account, counts['account'][account.pk])
+                for account in self.form.fields['account'].objects
+                if counts['account'][account.pk]
+            ],
+            'box': [
+                (box, counts['box'][box.pk])
+                for box in self.form.fields['box'].objects
+                if counts['box'][box.pk]
+            ],
+            'month': sorted(counts['month'].items(), reverse=True),
+        }
+
+    def get_context_data(self, **kwargs):
+        kwargs['form'] = self.form
+        kwargs['facets'] = self.get_facets()
+        return super().get_context_data(**kwargs)
+
+
+class TransactionSearchView(TransactionsView):
+    form_class = TransactionSearchForm
+    template_name = 'bank/transaction_search.html'
 
 
 class TransactionCreateView(FormView):
@@ -172,6 +257,55 @@ class TransactionCreateView(FormView):
         return HttpResponseRedirect(self.get_success_url())
 
 
+class TransactionImportView(FormView):
+    form_class = TransactionImportForm
+    success_url = reverse_lazy('bank:transactions')
+    template_name = 'bank/transaction_import.html'
+
+    def get_form_kwargs(self):
+        kwargs = super().get_form_kwargs()
+        kwargs['owner_id'] = self.request.user.pk
+        return kwargs
+
+    def form_valid(self, form):
+        parse = PARSERS[form.cleaned_data['format']]
+        importer = TransactionImporter(form.cleaned_data['account'],
+                                       form.cleaned_data['box'])
+        lines = codecs.iterdecode(form.cleaned_data['file'], 'utf-8')
+        try:
+            count = importer.run(parse(lines))
+        except ValidationError as e:
+            form.add_error('file', e)
+            return self.form_invalid(form)
+        except UnicodeDecodeError:
+            form.add_error('file', _("The file must be UTF-8 encoded."))
+            return self.form_invalid(form)
+        messages.success(self.request, _(
+            "{count} transactions imported.").format(count=count))
+        return HttpResponseRedirect(self.get_success_url())
+
+
+class TransactionExportView(View):
+
+    def get(self, request, file_format):
+        content_type, export = EXPORTERS[file_format]
+        queryset = Transaction.objects.filter(
+            owner_id=request.user.pk).select_related('account', 'box')
+        response = StreamingHttpResponse(export(iter_pages(queryset)),
+                                         content_type=content_type)
+        response['Content-Disposition'] = \
+            'attachment; filename="transactions.{}"'.format(file_format)
+        return response
+
+
+class CounterpartyAutocompleteView(View):
+
+    def get(self, request):
+        names = Counterparty.objects.suggest(request.user.pk,
+                                             request.GET.get('term', ''))
+        return JsonResponse({'results': names})
+
+
 class TransactionUpdateView(UpdateView):
     model = Transaction
     fields = ['other', 'date', 'short_description']
@@ -0,0 +1,21 @@
+# -*- coding: utf-8 -*-
+from .base import *  # noqa
+
+
+# Templates are compiled once per process instead of on every render.
+TEMPLATES[0]['APP_DIRS'] = False
+TEMPLATES[0]['OPTIONS']['loaders'] = [
+    ('django.template.loaders.cached.Loader', [
+        'django.template.loaders.filesystem.Loader',
+        'django.template.loaders.app_directories.Loader',
+    ]),
+]
+
+# Cached values are invalidated by bumping per-user versions, which must be
+# shared by all the processes.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.memcached.MemcachedCache',
+        'LOCATION': secrets.get('CACHE_LOCATION', '127.0.0.1:11211'),
+    },
+}
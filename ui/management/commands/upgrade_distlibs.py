@@ -1,18 +1,62 @@
 # -*- coding: utf-8 -*-
-from io import BytesIO
+from concurrent.futures import ThreadPoolExecutor
+from hashlib import sha256
 import json
+import os
+import shutil
+import tempfile
 from urllib.request import urlopen
 from zipfile import ZipFile
 
 from django.conf import settings
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
+from unipath import Path
 
 
 class Command(BaseCommand):
     help = "Install or upgrade static css/js libs"
 
-    def _unpack_raw(self, conf):
-        """Fetch files from direct URL and save them to the tmp directory."""
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--jobs', type=int, default=4,
+            help="The number of libraries fetched concurrently.")
+        parser.add_argument(
+            '--config',
+            default=settings.BASE_DIR.child('ui', 'data', 'distlibs.json'),
+            help="The JSON file describing the libraries.")
+        parser.add_argument(
+            '--lib-dir',
+            default=settings.BASE_DIR.child('ui', 'static', 'lib'),
+            help="The directory to install the libraries to.")
+        parser.add_argument(
+            '--cache-dir',
+            default=settings.BASE_DIR.child('tmp', 'distlibs'),
+            help="The directory where downloaded files are kept, so that "
+                 "unchanged libraries are not downloaded again.")
+
+    def _fetch(self, name, conf, url):
+        """Return the path of the file at `url` in the cache, downloading it
+        if needed. Files are streamed to disk and only appear in the cache
+        once complete.
+        """
+        key = sha256('\0'.join([name, conf['version'], url]).encode(
+            'utf-8')).hexdigest()
+        filename = self._cache_dir.child(key[:2], key)
+        if filename.exists():
+            return filename
+        os.makedirs(filename.parent, exist_ok=True)
+        fd, part = tempfile.mkstemp(dir=filename.parent, suffix='.part')
+        try:
+            with os.fdopen(fd, 'wb') as f, urlopen(url) as response:
+                shutil.copyfileobj(response, f)
+            os.replace(part, filename)
+        except BaseException:
+            os.remove(part)
+            raise
+        return filename
+
+    def _unpack_raw(self, name, conf, tmp_dir):
+        """Fetch files from direct URL and copy them to `tmp_dir`."""
         if 'include' in conf:
             files = [
                 (conf['source'].format(V=conf['version'], F=f), f)
@@ -22,19 +66,17 @@ class Command(BaseCommand):
             files = [(conf['source'].format(V=conf['version']), None)]
         for url, output in files:
             if output is not None:
-                filename = self._tmp_dir.child(*output.split('/'))
+                filename = tmp_dir.child(*output.split('/'))
             else:
-                filename = self._tmp_dir.child(url.split('/')[-1])
+                filename = tmp_dir.child(url.split('/')[-1])
             filename.parent.mkdir(True)
-            with urlopen(url) as f:
-                filename.write_file(f.read().decode('utf-8'))
+            shutil.copyfile(self._fetch(name, conf, url), filename)
 
-    def _unpack_zip(self, conf):
-        """Fetch an archive and extract it to the tmp directory."""
+    def _unpack_zip(self, name, conf, tmp_dir):
+        """Fetch an archive and extract it to `tmp_dir`."""
         source = conf['source'].format(V=conf['version'])
-        with urlopen(source) as f:
-            ar = ZipFile(BytesIO(f.read()))
-        ar.extractall(self._tmp_dir)
+        with ZipFile(self._fetch(name, conf, source)) as ar:
+            ar.extractall(tmp_dir)
 
     def _get_files(self, conf):
         """Return a list of couples (temporary file, destination file)."""
@@ -48,36 +90,70 @@ class Command(BaseCommand):
             files = [(f, f) for f in conf['include']]
         return files
 
-    def _move_to(self, output_dir, conf):
-        """Move temporary files to `output_dir`."""
+    def _move_to(self, output_dir, conf, tmp_dir):
+        """Move the files of `tmp_dir` to `output_dir`."""
         output_dir.mkdir(True)
         if 'include' in conf:
             files = self._get_files(conf)
             for tmp_file, lib_file in files:
-                self._tmp_dir.child(*tmp_file.split('/')).rename(
+                tmp_dir.child(*tmp_file.split('/')).rename(
                     output_dir.child(*lib_file.split('/')), True)
         else:
-            for f in self._tmp_dir.listdir():
+            for f in tmp_dir.listdir():
                 f.move(output_dir)
 
+    def _install(self, name, conf, lib_dir):
+        """Fetch the library `name` and install it to `lib_dir`."""
+        tmp_dir = Path(tempfile.mkdtemp(prefix='.{}-'.format(name),
+                                        dir=lib_dir.parent))
+        try:
+            if conf['type'] == 'raw':
+                self._unpack_raw(name, conf, tmp_dir)
+            elif conf['type'] == 'zip':
+                self._unpack_zip(name, conf, tmp_dir)
+            self._move_to(lib_dir.child(name), conf, tmp_dir)
+        finally:
+            tmp_dir.rmtree()
+        if 'rename' in conf:
+            for src, dst in conf['rename'].items():
+                lib_dir.child(
+                    name, *src.format(V=conf['version']).split('/')
+                ).rename(
+                    lib_dir.child(name, *dst.split('/')), True)
+
     def handle(self, *args, **options):
-        lib_dir = settings.BASE_DIR.child('ui', 'static', 'lib')
-        filename = settings.BASE_DIR.child('ui', 'data', 'distlibs.json')
-        with open(filename) as f:
+        lib_dir = Path(options['lib_dir']).absolute()
+        self._cache_dir = Path(options['cache_dir']).absolute()
+        with open(options['config']) as f:
             distlibs = json.loads(f.read())
 
-        lib_dir.rmtree()
-        for name, conf in distlibs.items():
-            self._tmp_dir = settings.BASE_DIR.child('tmp', name)
-            self._tmp_dir.mkdir(True)
-            if conf['type'] == 'raw':
-                self._unpack_raw(conf)
-            elif conf['type'] == 'zip':
-                self._unpack_zip(conf)
-            self._move_to(lib_dir.child(name), conf)
-            if 'rename' in conf:
-                for src, dst in conf['rename'].items():
-                    lib_dir.child(
-                        name, *src.format(V=conf['version']).split('/')
-                    ).rename(
-                        lib_dir.child(name, *dst.split('/')), True)
+        # Libraries are installed to a new directory next to `lib_dir`,
+        # which only replaces it once all of them succeeded.
+        lib_dir.parent.mkdir(True)
+        new_dir = Path(tempfile.mkdtemp(prefix='.{}-'.format(lib_dir.name),
+                                        dir=lib_dir.parent))
+        try:
+            with ThreadPoolExecutor(max_workers=options['jobs']) as executor:
+                futures = {
+                    name: executor.submit(self._install, name, conf, new_dir)
+                    for name, conf in distlibs.items()
+                }
+            errors = [
+                "{}: {}".format(name, future.exception())
+                for name, future in sorted(futures.items())
+                if future.exception() is not None
+            ]
+            if errors:
+                raise CommandError('\n'.join(errors))
+        except BaseException:
+            new_dir.rmtree()
+            raise
+
+        os.chmod(new_dir, 0o755)
+        old_dir = Path(lib_dir.parent, '.{}-old'.format(lib_dir.name))
+        old_dir.rmtree()
+        if lib_dir.exists():
+            lib_dir.rename(old_dir)
+        new_dir.rename(lib_dir)
+        old_dir.rmtree()
+        self.stdout.write("{} libraries installed.".format(len(distlibs)))
@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+"""Keyset (cursor) based pagination.
+Unlike offset pagination, fetching a page costs the same whatever its depth
+since it seeks the index on the ordering fields instead of skipping rows.
+"""
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from functools import reduce
+import json
+import operator
+
+from django.core.exceptions import ValidationError
+from django.core.paginator import InvalidPage
+from django.db.models import Q
+from django.http import Http404
+from django.utils.functional import cached_property
+from django.utils.translation import ugettext as _
+
+
+NEXT = 'n'
+PREVIOUS = 'p'
+
+
+class InvalidCursor(InvalidPage):
+    pass
+
+
+class CursorPaginator(object):
+    """Paginate a queryset with respect to the given ordering.
+    The last ordering field must be unique (typically the primary key) so
+    that the position of every object is well defined.
+    - `with_count`: whether `count` should run the exact `COUNT(*)` query or
+      be None.
+    """
+
+    def __init__(self, object_list, per_page, ordering, with_count=True):
+        self.object_list = object_list
+        self.per_page = int(per_page)
+        self.ordering = list(ordering)
+        self.with_count = with_count
+        self.fields = [
+            object_list.model._meta.get_field(name.lstrip('-'))
+            for name in self.ordering
+        ]
+
+    @cached_property
+    def count(self):
+        """Return the total number of objects, or None if counting is
+        disabled.
+        """
+        if not self.with_count:
+            return None
+        return self.object_list.count()
+
+    def encode_cursor(self, obj, direction):
+        """Return the opaque cursor pointing at `obj`."""
+        data = [direction] + [f.value_to_string(obj) for f in self.fields]
+        return urlsafe_b64encode(json.dumps(data).encode('utf-8')).decode(
+            'ascii')
+
+    def decode_cursor(self, cursor):
+        """Return a couple (direction, values) from an opaque cursor."""
+        try:
+            data = json.loads(
+                urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8'))
+            if (not isinstance(data, list) or
+                    len(data) != len(self.fields) + 1 or
+                    data[0] not in (NEXT, PREVIOUS)):
+                raise ValueError(cursor)
+            values = [f.to_python(v) for f, v in zip(self.fields, data[1:])]
+        except (TypeError, ValueError, ValidationError):
+            raise InvalidCursor(_("Invalid cursor."))
+        return data[0], values
+
+    def _seek(self, values, backwards):
+        """Return the condition matching objects located after `values`
+        with respect to the ordering, or before if `backwards` is True.
+        """
+        conditions = []
+        for i, name in enumerate(self.ordering):
+            descending = name.startswith('-') != backwards
+            condition = Q(**{'{}__{}'.format(
+                name.lstrip('-'), 'lt' if descending else 'gt'): values[i]})
+            for prev_name, prev_value in zip(self.ordering[:i], values[:i]):
+                condition &= Q(**{prev_name.lstrip('-'): prev_value})
+            conditions.append(condition)
+        return reduce(operator.or_, conditions)
+
+    def page(self, cursor=None):
+        """Return the page starting right after (or ending right before)
+        the cursor, or the first page if there is no cursor.
+        """
+        if not cursor:
+            objects = list(
+                self.object_list.order_by(*self.ordering)[:self.per_page + 1])
+            return CursorPage(objects[:self.per_page], self,
+                              has_previous=False,
+                              has_next=len(objects) > self.per_page)
+
+        direction, values = self.decode_cursor(cursor)
+        if direction == NEXT:
+            queryset = self.object_list.filter(self._seek(values, False))
+            objects = list(
+                queryset.order_by(*self.ordering)[:self.per_page + 1])
+            return CursorPage(objects[:self.per_page], self,
+                              has_previous=True,
+                              has_next=len(objects) > self.per_page)
+
+        reverse_ordering = [
+            name[1:] if name.startswith('-') else '-' + name
+            for name in self.ordering
+        ]
+        queryset = self.object_list.filter(self._seek(values, True))
+        objects = list(
+            queryset.order_by(*reverse_ordering)[:self.per_page + 1])
+        return CursorPage(objects[:self.per_page][::-1], self,
+                          has_previous=len(objects) > self.per_page,
+                          has_next=True)
+
+
+class CursorPage(object):
+    keyset = True
+
+    def __init__(self, object_list, paginator, has_previous, has_next):
+        self.object_list = object_list
+        self.paginator = paginator
+        self._has_previous = has_previous
+        self._has_next = has_next
+
+    def __repr__(self):
+        return '<Cursor page of {} objects>'.format(len(self))
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self._has_previous or self._has_next
+
+    @property
+    def next_cursor(self):
+        if not self._has_next or not self.object_list:
+            return None
+        return self.paginator.encode_cursor(self.object_list[-1], NEXT)
+
+    @property
+    def previous_cursor(self):
+        if not self._has_previous or not self.object_list:
+            return None
+        return self.paginator.encode_cursor(self.object_list[0], PREVIOUS)
+
+
+class CursorPaginationMixin(object):
+    """Replace the offset pagination of a `ListView` by keyset pagination.
+    The view must define `ordering`.
+    """
+    cursor_kwarg = 'cursor'
+    paginate_count = True
+
+    def paginate_queryset(self, queryset, page_size):
+        paginator = CursorPaginator(queryset, page_size, self.get_ordering(),
+                                    with_count=self.paginate_count)
+        try:
+            page = paginator.page(self.request.GET.get(self.cursor_kwarg))
+        except InvalidPage as e:
+            raise Http404(str(e))
+        return (paginator, page, page.object_list, page.has_other_pages())
@@ -1,125 +1,109 @@
 # -*- coding: utf-8 -*-
+from collections import namedtuple
+from functools import lru_cache
+
 from django.forms.utils import flatatt
 from django.template import Library
-from django.utils.html import format_html
-from django.utils.safestring import mark_safe
+from django.utils.html import conditional_escape, format_html
+from django.utils.safestring import SafeData, mark_safe
 
 
 register = Library()
 
 
-class BsField(object):
-    """Handle the bootstrap-like rendering of a form field.
-    This class is only intended to be wrapped through `bs_field()`.
-    """
+StaticParts = namedtuple('StaticParts', [
+    'label_html', 'help_text_html', 'widget_attrs', 'error_widget_attrs',
+])
 
-    def __init__(self, field, **kwargs):
-        """See `bs_field()` simple_tag."""
-        self.html = ''
-        self.field = field
-        self.form_group = kwargs.get('form_group', True)
-        self.label = kwargs.get('label', True)
-
-        if self.label is True:
-            self.label = field.label
-            if field.field.label_suffix:
-                self.label += field.field.label_suffix
-
-        self.build_widget()
-        if self.field.errors:
-            self.build_errors()
-        if self.help_text:
-            self.build_help_text()
-        if self.label:
-            self.build_label()
-        if self.form_group:
-            self.build_form_group()
-
-    def build_widget(self):
-        """Build the field widget itself."""
-        self.html += self.field.as_widget(attrs=self.widget_attrs)
-
-    def build_errors(self):
-        """Build error messages."""
-        error_messages = []
-        for error in self.field.errors:
-            error_messages.append('<li>{}</li>'.format(error))
-        self.html += '<ul class="error-block">{}</ul>'.format(
-            ''.join(error_messages))
-
-    def build_help_text(self):
-        """Build the help text."""
-        help_text_attrs = {'class': 'text-muted', 'id': self.help_text_id}
-        self.html += format_html('<div{}>{}</div>', flatatt(help_text_attrs),
-                                 mark_safe(self.help_text))
-
-    def build_label(self):
-        """Build the label."""
-        if self.widget_name == 'CheckboxInput':
-            self.html = format_html('<label>{}&nbsp;{}</label>',
-                                    mark_safe(self.html), self.label)
-            self.html = '<div class="checkbox">{}</div>'.format(self.html)
-        else:
-            label_classes = ['control-label']
-            if self.field.field.required:
-                label_classes.append('required')
-            label_attrs = {}
-            label_attrs['class'] = ' '.join(label_classes)
-            label_attrs['for'] = self.field.id_for_label
-            label_attrs = flatatt(label_attrs) if label_attrs else ''
-            label_html = format_html('<label{}>{}</label>', label_attrs,
-                                     self.label)
-            self.html = label_html + self.html
-
-    def build_form_group(self):
-        """Build the form-group."""
-        group_classes = ['form-group']
-        if self.field.errors:
-            group_classes.append('has-error')
-        group_attrs = {'class': ' '.join(group_classes)}
-        group_attrs = flatatt(group_attrs)
-        self.html = format_html('<div{}>{}</div>', group_attrs,
-                                mark_safe(self.html))
-
-    @property
-    def widget_name(self):
-        """Return the widget name."""
-        return self.field.field.widget.__class__.__name__
-
-    @property
-    def widget_classes(self):
-        """Return the widget classes according to the widget name and whether
-        there are errors or not.
-        """
-        classes = []
-        if self.widget_name != 'CheckboxInput':
-            classes.append('form-control')
-            if self.field.errors:
-                classes.append('form-control-error')
-        return classes
-
-    @property
-    def widget_attrs(self):
-        """Return the widget extra attributes."""
-        attrs = {}
-        classes = self.widget_classes
-        if classes:
-            attrs['class'] = ' '.join(classes)
-        if self.field.field.required:
+
+@lru_cache(maxsize=1024)
+def get_static_parts(is_checkbox, label, safe_label, required, help_text,
+                     id_for_label):
+    """Return the parts of a field rendering which don't depend on its
+    value, memoized since they are the same on every render of a form.
+    - `is_checkbox`: whether the widget is a `CheckboxInput`
+    - `label`: the label to display, or an empty string for no label
+    - `safe_label`: whether the label is already safe for HTML
+    - `required`: whether the field is required
+    - `help_text`: the help text, as a string
+    - `id_for_label`: the ID of the widget
+    """
+    if safe_label:
+        label = mark_safe(label)
+
+    label_html = ''
+    if label and not is_checkbox:
+        label_classes = ['control-label']
+        if required:
+            label_classes.append('required')
+        label_attrs = {
+            'class': ' '.join(label_classes),
+            'for': id_for_label,
+        }
+        label_html = format_html('<label{}>{}</label>', flatatt(label_attrs),
+                                 label)
+    elif label:
+        label_html = conditional_escape(label)
+
+    help_text_html = ''
+    help_text_id = id_for_label + '_help_text'
+    if help_text:
+        help_text_attrs = {'class': 'text-muted', 'id': help_text_id}
+        help_text_html = format_html('<div{}>{}</div>',
+                                     flatatt(help_text_attrs),
+                                     mark_safe(help_text))
+
+    widget_attrs = {}
+    error_widget_attrs = {}
+    if not is_checkbox:
+        widget_attrs['class'] = 'form-control'
+        error_widget_attrs['class'] = 'form-control form-control-error'
+    for attrs in (widget_attrs, error_widget_attrs):
+        if required:
             attrs['required'] = 'required'
-        if self.help_text:
-            attrs['aria-describedby'] = self.help_text_id
-        return attrs
+        if help_text:
+            attrs['aria-describedby'] = help_text_id
+
+    return StaticParts(label_html, help_text_html, widget_attrs,
+                       error_widget_attrs)
 
-    @property
-    def help_text(self):
-        """Return the help text."""
-        return self.field.field.help_text
 
-    @property
-    def help_text_id(self):
-        """Return the ID of the help text."""
-        return self.field.id_for_label + '_help_text'
+def render_field(field, form_group=True, label=True):
+    """Return the bootstrap-like HTML of a bound field, built with a single
+    join. See `bs_field()`.
+    """
+    if label is True:
+        label = field.label
+        if field.field.label_suffix:
+            label += field.field.label_suffix
+    is_checkbox = field.field.widget.__class__.__name__ == 'CheckboxInput'
+    help_text = field.field.help_text
+    parts = get_static_parts(
+        is_checkbox, str(label or ''), isinstance(label, SafeData),
+        field.field.required, str(help_text or ''), field.id_for_label)
+    errors = field.errors
+
+    html = []
+    if form_group:
+        html.append('<div class="form-group has-error">' if errors
+                    else '<div class="form-group">')
+    if label and is_checkbox:
+        html.append('<div class="checkbox"><label>')
+    else:
+        html.append(parts.label_html)
+    # `as_widget()` may add the id to the attributes, hence the copy.
+    html.append(field.as_widget(attrs=dict(
+        parts.error_widget_attrs if errors else parts.widget_attrs)))
+    if errors:
+        html.append('<ul class="error-block">')
+        html.extend('<li>{}</li>'.format(error) for error in errors)
+        html.append('</ul>')
+    html.append(parts.help_text_html)
+    if label and is_checkbox:
+        html.extend(['&nbsp;', parts.label_html, '</label></div>'])
+    if form_group:
+        html.append('</div>')
+    return ''.join(html)
 
 
 @register.simple_tag
@@ -132,4 +116,20 @@ def bs_field(field, **kwargs):
       - `label`: the label to display as a string, or True to display the
         default label, or False skip label rendering. (default: True)
     """
-    return mark_safe(BsField(field, **kwargs).html)
+    return mark_safe(render_field(field, **kwargs))
+
+
+@register.simple_tag
+def bs_form(form, **kwargs):
+    """Render the non field errors and all the fields of a form, in one pass.
+    Hidden fields are rendered as bare widgets.
+    - `form`: the `django.forms.Form` to be rendered
+    - `kwargs`: the options of `bs_field()`, applied to every visible field
+    """
+    html = [str(form.non_field_errors())]
+    for field in form:
+        if field.is_hidden:
+            html.append(str(field))
+        else:
+            html.append(render_field(field, **kwargs))
+    return mark_safe(''.join(html))
@@ -6,7 +6,17 @@ register = Library()
 
 
 @register.simple_tag
-def url_replace(request, field, value):
+def url_replace(request, field, value, **others):
+    """Return the current querystring with `field` set to `value`, or
+    removed if `value` is None (eg: to go back to the first page).
+    - `others`: other fields to set or remove the same way (eg: `cursor`
+      to go back to the first page when changing a filter)
+    """
     querystring = request.GET.copy()
-    querystring[field] = value
+    others[field] = value
+    for field, value in others.items():
+        if value is None:
+            querystring.pop(field, None)
+        else:
+            querystring[field] = value
     return "?{}".format(querystring.urlencode())
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+from io import StringIO
+import json
+import os
+import tempfile
+from urllib.request import pathname2url
+from zipfile import ZipFile
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import SimpleTestCase
+from unipath import Path
+
+
+class UpgradeDistlibsTestCase(SimpleTestCase):
+
+    def setUp(self):
+        self.dir = Path(tempfile.mkdtemp())
+        self.addCleanup(self.dir.rmtree)
+        sources = self.dir.child('sources')
+        sources.mkdir()
+        with ZipFile(sources.child('lib-1.0.zip'), 'w') as ar:
+            ar.writestr('lib-1.0/dist/lib.min.js', "lib")
+            ar.writestr('lib-1.0/scss/lib.scss', "scss")
+            ar.writestr('lib-1.0/README', "readme")
+        sources.child('raw-2.0.js').write_file("raw")
+        self.url = 'file://' + pathname2url(sources)
+        self.lib_dir = self.dir.child('lib')
+        self.write_config({
+            'lib': {
+                'type': 'zip',
+                'version': '1.0',
+                'source': self.url + '/lib-{V}.zip',
+                'include': {'lib-{V}': ['scss/', 'dist/lib.min.js']},
+                'rename': {'dist/lib.min.js': 'js/lib.js'},
+            },
+            'raw': {
+                'type': 'raw',
+                'version': '2.0',
+                'source': self.url + '/raw-{V}.js',
+                'rename': {'raw-{V}.js': 'raw.js'},
+            },
+        })
+
+    def write_config(self, distlibs):
+        self.config = self.dir.child('distlibs.json')
+        self.config.write_file(json.dumps(distlibs))
+
+    def upgrade(self):
+        call_command('upgrade_distlibs', config=self.config,
+                     lib_dir=self.lib_dir, cache_dir=self.dir.child('cache'),
+                     stdout=StringIO())
+
+    def test_upgrade(self):
+        self.lib_dir.mkdir()
+        self.lib_dir.child('stale.js').write_file("stale")
+        self.upgrade()
+        self.assertEqual(sorted(os.listdir(self.lib_dir)), ['lib', 'raw'])
+        self.assertEqual(self.lib_dir.child('lib', 'js', 'lib.js').read_file(),
+                         "lib")
+        self.assertEqual(
+            self.lib_dir.child('lib', 'scss', 'lib.scss').read_file(), "scss")
+        self.assertFalse(self.lib_dir.child('lib', 'README').exists())
+        self.assertEqual(self.lib_dir.child('raw', 'raw.js').read_file(),
+                         "raw")
+        # Only the installed tree and the cache are left behind.
+        self.assertEqual(sorted(os.listdir(self.dir)),
+                         ['cache', 'distlibs.json', 'lib', 'sources'])
+
+    def test_cache(self):
+        self.upgrade()
+        self.dir.child('sources').rmtree()
+        self.upgrade()
+        self.assertEqual(self.lib_dir.child('raw', 'raw.js').read_file(),
+                         "raw")
+
+    def test_failure_keeps_installed_libs(self):
+        self.upgrade()
+        self.write_config({
+            'raw': {
+                'type': 'raw',
+                'version': '3.0',
+                'source': self.url + '/raw-{V}.js',
+            },
+        })
+        with self.assertRaises(CommandError):
+            self.upgrade()
+        self.assertEqual(sorted(os.listdir(self.lib_dir)), ['lib', 'raw'])
+        self.assertEqual(self.lib_dir.child('raw', 'raw.js').read_file(),
+                         "raw")
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+from django.contrib.auth.models import User
+from django.test import TestCase
+
+from ..pagination import CursorPaginator, InvalidCursor
+
+
+class CursorPaginatorTestCase(TestCase):
+
+    def setUp(self):
+        for i in range(7):
+            User.objects.create_user('user_{}'.format(i))
+        self.paginator = CursorPaginator(User.objects.all(), 3,
+                                         ('-username', 'id'))
+
+    def usernames(self, page):
+        return [user.username for user in page]
+
+    def test_first_page(self):
+        page = self.paginator.page()
+        self.assertEqual(self.usernames(page),
+                         ['user_6', 'user_5', 'user_4'])
+        self.assertFalse(page.has_previous())
+        self.assertTrue(page.has_next())
+        self.assertIsNone(page.previous_cursor)
+
+    def test_next_pages(self):
+        page = self.paginator.page()
+        page = self.paginator.page(page.next_cursor)
+        self.assertEqual(self.usernames(page),
+                         ['user_3', 'user_2', 'user_1'])
+        self.assertTrue(page.has_previous())
+        self.assertTrue(page.has_next())
+        page = self.paginator.page(page.next_cursor)
+        self.assertEqual(self.usernames(page), ['user_0'])
+        self.assertFalse(page.has_next())
+        self.assertIsNone(page.next_cursor)
+
+    def test_previous_pages(self):
+        page = self.paginator.page()
+        page = self.paginator.page(page.next_cursor)
+        page = self.paginator.page(page.next_cursor)
+        page = self.paginator.page(page.previous_cursor)
+        self.assertEqual(self.usernames(page),
+                         ['user_3', 'user_2', 'user_1'])
+        self.assertTrue(page.has_previous())
+        page = self.paginator.page(page.previous_cursor)
+        self.assertEqual(self.usernames(page),
+                         ['user_6', 'user_5', 'user_4'])
+        self.assertFalse(page.has_previous())
+
+    def test_count(self):
+        self.assertEqual(self.paginator.count, 7)
+        paginator = CursorPaginator(User.objects.all(), 3, ('id',),
+                                    with_count=False)
+        self.assertIsNone(paginator.count)
+
+    def test_invalid_cursor(self):
+        # 'W10=' is the well-formed but empty JSON list.
+        for cursor in ['foo', 'WyJ4IiwgIjEiXQ==', 'é', 'W10=']:
+            with self.assertRaises(InvalidCursor):
+                self.paginator.page(cursor)
@@ -1,8 +1,9 @@
 # -*- coding: utf-8 -*-
 from django import forms
-from django.test import TestCase
+from django.test import RequestFactory, TestCase
 
-from ..templatetags.bs import bs_field
+from ..templatetags.bs import bs_field, bs_form
+from ..templatetags.utils import url_replace
 
 
 class TestForm(forms.Form):
@@ -287,3 +288,51 @@ class BsFieldTestCase(TestCase):
             'required="required" rows="10">\r\nfoo bar</textarea>'
             '</div>'
         ))
+
+
+class UrlReplaceTestCase(TestCase):
+
+    def setUp(self):
+        self.request = RequestFactory().get('/', {'cursor': 'abc', 'q': 'x'})
+
+    def test_replace(self):
+        url = url_replace(self.request, 'cursor', 'def')
+        self.assertEqual(sorted(url[1:].split('&')), ['cursor=def', 'q=x'])
+
+    def test_add(self):
+        url = url_replace(self.request, 'page', 2)
+        self.assertEqual(sorted(url[1:].split('&')),
+                         ['cursor=abc', 'page=2', 'q=x'])
+
+    def test_remove(self):
+        self.assertEqual(url_replace(self.request, 'cursor', None), '?q=x')
+
+    def test_others(self):
+        url = url_replace(self.request, 'q', 'y', cursor=None, page=1)
+        self.assertEqual(sorted(url[1:].split('&')), ['page=1', 'q=y'])
+
+
+class BsFormTestCase(TestCase):
+
+    def test_bs_form(self):
+        form = TestForm({'url_field': "toto"})
+        html = bs_form(form)
+        self.assertTrue(html.startswith(
+            '<div class="form-group">'
+            '<div class="checkbox">'
+            '<label><input id="id_boolean_field" name="boolean_field" '
+            'type="checkbox" />&nbsp;Boolean Field</label>'
+            '</div></div>'))
+        for name in TestForm.base_fields:
+            if name != 'hidden_field':
+                self.assertIn(bs_field(form[name]), html)
+        self.assertIn(
+            '<input id="id_hidden_field" name="hidden_field" type="hidden" />',
+            html)
+
+    def test_memoized_parts_follow_the_field(self):
+        form = TestForm()
+        form.fields['char_field'].label = "Other label"
+        self.assertIn('>Other label</label>', bs_field(form['char_field']))
+        self.assertIn('>Char Field</label>',
+                      bs_field(TestForm()['char_field']))